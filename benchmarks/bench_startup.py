@@ -0,0 +1,108 @@
+"""Startup benchmark: time from process start to the window's first frame.
+
+Each run starts Bistro in a fresh process with empty data, cache and
+config directories, waits for the main window to paint once and quits.
+A display is needed; on a headless machine use a virtual one:
+
+    xvfb-run python3 benchmarks/bench_startup.py --runs 10
+
+Prints JSON with the median and every run. With --max-ms the exit status
+is 1 when the median is slower than that, so it can guard against
+regressions in CI.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Heavy modules that should not be imported before the first frame
+DEFERRED = ("requests", "recipe_scrapers", "numpy")
+
+
+def run_child():
+    sys.path.insert(0, ROOT)
+    start = float(os.environ["BISTRO_BENCH_START"])
+
+    t = time.perf_counter()
+    from gi.repository import Gio
+    from bistro.app import UnifiedApp
+    import_ms = (time.perf_counter() - t) * 1000
+
+    app = UnifiedApp()
+    # Don't hand over to a Bistro that is already running
+    app.set_flags(app.get_flags() | Gio.ApplicationFlags.NON_UNIQUE)
+
+    def on_window_added(app, win):
+        win.connect("map", on_map)
+
+    def on_map(win):
+        clock = win.get_frame_clock()
+        handler = None
+
+        def after_paint(clock):
+            clock.disconnect(handler)
+            print(json.dumps({
+                "first_frame_ms": (time.time() - start) * 1000,
+                "import_ms": import_ms,
+                "deferred_imported": [m for m in DEFERRED if m in sys.modules],
+            }), flush=True)
+            app.quit()
+
+        handler = clock.connect("after-paint", after_paint)
+
+    app.connect("window-added", on_window_added)
+    app.run([])
+
+
+def run_once():
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ)
+        for var in ("XDG_DATA_HOME", "XDG_CACHE_HOME", "XDG_CONFIG_HOME"):
+            env[var] = os.path.join(tmp, var.lower())
+        env["BISTRO_BENCH_START"] = repr(time.time())
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child"],
+            env=env, cwd=ROOT, capture_output=True, text=True, timeout=60,
+        )
+    for line in reversed(out.stdout.splitlines()):
+        if line.startswith("{"):
+            return json.loads(line)
+    raise RuntimeError(f"startup run failed:\n{out.stderr}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, help="fail if the median first frame is slower")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child()
+        return 0
+
+    runs = [run_once() for _ in range(args.runs)]
+    frames = [r["first_frame_ms"] for r in runs]
+    result = {
+        "benchmark": "startup",
+        "first_frame_ms": statistics.median(frames),
+        "import_ms": statistics.median(r["import_ms"] for r in runs),
+        "deferred_imported": sorted({m for r in runs for m in r["deferred_imported"]}),
+        "runs": frames,
+    }
+    print(json.dumps(result, indent=2))
+    if args.max_ms is not None and result["first_frame_ms"] > args.max_ms:
+        print(f"Startup regressed: {result['first_frame_ms']:.0f} ms > {args.max_ms:.0f} ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+"""Local stand-in for TheCocktailDB and TheMealDB.
+
+Serves the endpoints Bistro uses (search.php, filter.php, lookup.php,
+random.php) from a deterministic, generated catalog, plus a PNG thumbnail
+for every record, so benchmarks never touch the network and see the same
+data every run. Base URLs are
+
+    http://127.0.0.1:<port>/cocktail/api/json/v1/1
+    http://127.0.0.1:<port>/meal/api/json/v1/1
+
+Run it on its own to point a development build at it:
+
+    python3 benchmarks/mock_server.py --port 8765
+"""
+
+import argparse
+import json
+import random
+import struct
+import threading
+import time
+import zlib
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+API_PATH = "api/json/v1/1"
+
+# kind -> (response key, id field, name field, thumbnail field, ingredient slots, first id)
+KINDS = {
+    "cocktail": ("drinks", "idDrink", "strDrink", "strDrinkThumb", 15, 11000),
+    "meal": ("meals", "idMeal", "strMeal", "strMealThumb", 20, 52700),
+}
+
+WORDS = ("amber", "bitter", "blue", "coastal", "copper", "crimson", "dusty", "fig", "garden", "golden",
+         "harbor", "ivory", "jade", "lazy", "midnight", "north", "old", "paper", "quiet", "rusty",
+         "salted", "smoky", "spiced", "tall", "velvet", "wild", "winter", "yellow", "zesty")
+NOUNS = {
+    "cocktail": ("sour", "fizz", "mule", "spritz", "smash", "julep", "collins", "punch", "flip", "cooler"),
+    "meal": ("stew", "curry", "pie", "tart", "salad", "risotto", "roast", "soup", "bake", "noodles"),
+}
+INGREDIENTS = {
+    "cocktail": ("Vodka", "Gin", "Light rum", "Tequila", "Bourbon", "Triple sec", "Lime juice", "Lemon juice",
+                 "Sugar syrup", "Soda water", "Ginger beer", "Angostura bitters", "Mint", "Orange", "Egg white"),
+    "meal": ("Chicken", "Beef", "Onion", "Garlic", "Tomatoes", "Olive Oil", "Butter", "Flour", "Rice", "Potatoes",
+             "Carrots", "Milk", "Eggs", "Parmesan", "Basil", "Cumin", "Paprika", "Salt", "Pepper", "Lemon"),
+}
+MEASURES = ("1 oz", "2 oz", "1/2 oz", "1 1/2 oz", "2 tbsp", "1 tsp", "200g", "1 cup", "3 cloves", "pinch", "", "to taste")
+CATEGORIES = {
+    "cocktail": ("Cocktail", "Ordinary Drink", "Shot", "Punch / Party Drink"),
+    "meal": ("Beef", "Chicken", "Dessert", "Pasta", "Seafood", "Vegetarian"),
+}
+AREAS = ("British", "French", "Italian", "Indian", "Mexican", "Japanese")
+
+THUMB_SIZE = 700  # The real APIs serve 700x700 images, and 350x350 under /preview
+
+
+class MockCatalog:
+    """count generated records of each kind, the same for a given seed."""
+
+    def __init__(self, count=500, seed=1):
+        self.records = {kind: [self.make_record(kind, i, random.Random(f"{seed}-{kind}-{i}")) for i in range(count)]
+                        for kind in KINDS}
+        self.by_id = {kind: {r[KINDS[kind][1]]: r for r in records} for kind, records in self.records.items()}
+        self.base_url = ""  # Set once the server is bound, for thumbnail URLs
+
+    def make_record(self, kind, i, rng):
+        _, id_field, name_field, thumb_field, slots, first_id = KINDS[kind]
+        r_id = str(first_id + i)
+        record = {
+            id_field: r_id,
+            name_field: f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {rng.choice(NOUNS[kind]).title()} {i}",
+            "strCategory": rng.choice(CATEGORIES[kind]),
+            "strInstructions": " ".join(rng.choice(WORDS) for _ in range(rng.randint(30, 120))).capitalize() + ".",
+            thumb_field: f"/images/{kind}/{r_id}.png",
+        }
+        if kind == "cocktail":
+            record["strAlcoholic"] = rng.choice(("Alcoholic", "Non alcoholic"))
+        else:
+            record["strArea"] = rng.choice(AREAS)
+        names = rng.sample(INGREDIENTS[kind], rng.randint(3, min(slots, 10)))
+        for n in range(1, slots + 1):
+            # Unused slots are null or empty, as in the real APIs
+            record[f"strIngredient{n}"] = names[n - 1] if n <= len(names) else None
+            record[f"strMeasure{n}"] = rng.choice(MEASURES) if n <= len(names) else ""
+        return record
+
+    def absolute(self, kind, record):
+        thumb_field = KINDS[kind][3]
+        return {**record, thumb_field: self.base_url + record[thumb_field]}
+
+    def respond(self, kind, endpoint, params):
+        """Return the JSON body for an API request."""
+        key, id_field, name_field, thumb_field, _, _ = KINDS[kind]
+        records = self.records[kind]
+        if endpoint == "search.php":
+            if "f" in params:
+                letter = params["f"].lower()[:1]
+                found = [r for r in records if r[name_field].lower().startswith(letter)]
+            else:
+                query = params.get("s", "").lower()
+                found = [r for r in records if query in r[name_field].lower()]
+        elif endpoint == "filter.php":
+            if "i" in params:
+                name = params["i"].replace("_", " ").lower()
+                found = [r for r in records if any((r.get(f"strIngredient{n}") or "").lower() == name
+                                                   for n in range(1, KINDS[kind][4] + 1))]
+            else:
+                found = [r for r in records if r["strCategory"].lower() == params.get("c", "").lower()]
+            # filter.php only carries the name, id and thumbnail
+            found = [{name_field: r[name_field], thumb_field: r[thumb_field], id_field: r[id_field]} for r in found]
+        elif endpoint == "lookup.php":
+            found = [r for r in (self.by_id[kind].get(params.get("i", "")),) if r]
+        elif endpoint == "random.php":
+            found = [random.choice(records)]
+        else:
+            return None
+        return {key: [self.absolute(kind, r) for r in found] or None}
+
+
+@lru_cache(maxsize=8)
+def png(size, seed):
+    """A size x size RGB PNG with some noise, so it doesn't compress to nothing."""
+    rng = random.Random(seed)
+    row = bytes(rng.getrandbits(8) for _ in range(size * 3))
+    raw = b"".join(b"\x00" + row[(y * 3) % len(row):] + row[:(y * 3) % len(row)] for y in range(size))
+
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+    header = struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw, 6)) + chunk(b"IEND", b"")
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "BistroMock/1.0"
+
+    def do_GET(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        server.requests += 1
+
+        parts = urlsplit(self.path)
+        segments = parts.path.strip("/").split("/")
+        params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+
+        if segments[0] == "images" and len(segments) >= 3:
+            size = THUMB_SIZE // 2 if segments[-1] == "preview" else THUMB_SIZE
+            self.send(200, "image/png", png(size, segments[2]))
+            return
+        if len(segments) >= 2 and segments[0] in KINDS and "/".join(segments[1:-1]) == API_PATH:
+            body = server.catalog.respond(segments[0], segments[-1], params)
+            if body is not None:
+                self.send(200, "application/json", json.dumps(body).encode())
+                return
+        self.send(404, "text/plain", b"not found")
+
+    def send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class MockServer(ThreadingHTTPServer):
+    """The stub API on a free local port, served from a background thread.
+
+    Use as a context manager; base_urls maps each kind to its API base URL
+    in the form Catalog takes.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, catalog=None, port=0, latency_ms=0):
+        super().__init__(("127.0.0.1", port), Handler)
+        self.catalog = catalog or MockCatalog()
+        self.latency = latency_ms / 1000
+        self.requests = 0
+        self.url = f"http://127.0.0.1:{self.server_address[1]}"
+        self.catalog.base_url = self.url
+        self.base_urls = {kind: f"{self.url}/{kind}/{API_PATH}" for kind in KINDS}
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, name="mock API", daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--records", type=int, default=500, help="records of each kind")
+    parser.add_argument("--latency-ms", type=float, default=0, help="delay added to every response")
+    args = parser.parse_args()
+
+    with MockServer(MockCatalog(args.records), args.port, args.latency_ms) as server:
+        for kind, url in server.base_urls.items():
+            print(f"{kind}: {url}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
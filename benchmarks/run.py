@@ -0,0 +1,377 @@
+"""Headless benchmark suite for Bistro's hot paths.
+
+Everything runs against a local stub of TheCocktailDB and TheMealDB
+(mock_server.py) with empty, temporary data, cache and config
+directories, so results don't depend on the network or on the user's
+saved recipes. No display is needed except for the startup benchmark,
+which is skipped without one (run the suite under xvfb-run to include it).
+
+    python3 benchmarks/run.py --output results.json
+    python3 benchmarks/run.py --baseline results.json --tolerance 0.25
+
+Measured:
+
+    search      response cache cold and warm against the stub, offline
+                catalog, query engine and full-text index searches
+    collection  loading 10, 100, 1000 and 10000 saved recipes: storage,
+                index sync and the Collection page model
+    shopping    adding and removing shopping list lines at scale
+    memory      bytes per search result row, full records and filter.php ones
+    startup     time to the first frame, via bench_startup.py
+
+Prints JSON: every timing in milliseconds (per operation where the name
+ends in _op_ms) and sizes in bytes. With --baseline, any metric more than
+--tolerance worse than the baseline's is reported and the exit status is 1.
+"""
+
+import argparse
+import atexit
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+
+# The bistro modules resolve their directories at import time
+TMP = tempfile.mkdtemp(prefix="bistro-bench-")
+atexit.register(shutil.rmtree, TMP, ignore_errors=True)
+for var in ("XDG_DATA_HOME", "XDG_CACHE_HOME", "XDG_CONFIG_HOME"):
+    os.environ[var] = os.path.join(TMP, var.lower())
+
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from gi.repository import Gio
+
+from bistro.cache import ResponseCache
+from bistro.catalog import Catalog
+from bistro.model import Recipe
+from bistro.query import RecipeQuery
+from bistro.repository import Repository
+from bistro.search import SearchResult
+from bistro.search_index import SearchIndex
+from bistro.storage import Storage
+
+from mock_server import INGREDIENTS, KINDS, MEASURES, WORDS, MockCatalog, MockServer
+
+COLLECTION_SIZES = (10, 100, 1000, 10000)
+SHOPPING_SIZES = (100, 1000, 10000)
+MEMORY_ROWS = 2000
+
+NAME_QUERIES = ("a", "sour", "gin", "amber", "velvet", "stew", "wild", "salad", "9", "zzz")
+INDEX_QUERIES = ("garlic", "lime juice", "smoky", "chicken curry", "velvet sour", "bitters", "golden")
+ENGINE_QUERIES = ("garlic", "chicken, garlic | onion", "gin, -lime juice", "category:beef", "eggs, flour, butter")
+
+
+def milliseconds(start):
+    return (time.perf_counter() - start) * 1000
+
+
+def timings(samples):
+    """Summary of a list of millisecond samples."""
+    samples = sorted(samples)
+    return {
+        "median_ms": statistics.median(samples),
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "max_ms": samples[-1],
+        "runs": len(samples),
+    }
+
+
+def time_each(func, args_list):
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        func(*args)
+        samples.append(milliseconds(start))
+    return timings(samples)
+
+
+def scratch(name):
+    return tempfile.mkdtemp(prefix=f"{name}-", dir=TMP)
+
+
+def favorites(catalog, n):
+    """n saved favorites, split between cocktails and meals, as Recipes."""
+    recipes = []
+    for i in range(n):
+        kind = ("cocktail", "meal")[i % 2]
+        recipes.append(Recipe.from_api(kind, catalog.absolute(kind, catalog.records[kind][i // 2])))
+    return recipes
+
+
+# Benchmarks
+
+def bench_search(server):
+    result = {}
+
+    # Response cache: the first search goes to the stub, repeating it is a cache hit
+    cache = ResponseCache(cache_dir=os.path.join(scratch("responses"), "responses"))
+    urls = [(f"{server.base_urls[kind]}/search.php?s={q}",) for kind in KINDS for q in NAME_QUERIES]
+    result["http_cold"] = time_each(cache.get_json, urls)
+    result["http_warm"] = time_each(cache.get_json, urls)
+    result["lookup_cold"] = time_each(cache.get_json, [(f"{server.base_urls[kind]}/lookup.php?i={KINDS[kind][5] + i}",)
+                                                        for kind in KINDS for i in range(20)])
+
+    # Offline catalog: a full sync of the stub, then local searches
+    catalog = Catalog(os.path.join(scratch("catalog"), "catalog.db"), base_urls=server.base_urls, rate=0)
+    start = time.perf_counter()
+    catalog.sync()
+    result["catalog_sync"] = {"total_ms": milliseconds(start), "records": sum(len(catalog.records(k)) for k in KINDS)}
+    result["catalog_name"] = time_each(catalog.search, [(kind, "Name", q) for kind in KINDS for q in NAME_QUERIES])
+    result["catalog_ingredient"] = time_each(catalog.search, [("meal", "Ingredient", q) for q in ("Garlic", "Onion", "Beef")]
+                                             + [("cocktail", "Ingredient", q) for q in ("Gin", "Vodka", "Mint")])
+
+    # Query engine over the synced meals
+    start = time.perf_counter()
+    engine = RecipeQuery(catalog.records("meal"))
+    result["engine_build"] = {"total_ms": milliseconds(start), "records": len(engine)}
+    result["engine_query"] = time_each(engine.query, [(q,) for q in ENGINE_QUERIES])
+
+    # Full-text index of the same records, as if they were all saved
+    index = SearchIndex(os.path.join(scratch("index"), "index.db"))
+    for kind in KINDS:
+        index.sync(kind, {r.id: r for r in catalog.records(kind)})
+    result["index_query"] = time_each(index.search, [(q,) for q in INDEX_QUERIES])
+    return result
+
+
+class CollectionModel:
+    """Just the state CollectionPage.load_items() touches, so the page's own
+    model code runs without building its widgets."""
+
+    def __init__(self, repository, item_type):
+        self.repository = repository
+        self.items = {}
+        self.store = Gio.ListStore.new(item_type)
+
+
+def bench_collection(sizes):
+    from bistro.pages.collection import CollectionItem, CollectionPage
+
+    catalog = MockCatalog(count=max(sizes) // 2 + 1)
+    result = {}
+    for n in sizes:
+        data_dir = scratch(f"collection-{n}")
+        storage = Storage(data_dir)
+        for recipe in favorites(catalog, n):
+            storage.put_favorite(recipe.kind, recipe.id, recipe.to_dict())
+        storage.flush()
+        index_path = os.path.join(data_dir, "index.db")
+
+        # First start: every favorite is added to the empty index
+        start = time.perf_counter()
+        Repository(Storage(data_dir), SearchIndex(index_path))
+        first_ms = milliseconds(start)
+
+        # Every later start: the index already matches
+        start = time.perf_counter()
+        repository = Repository(Storage(data_dir), SearchIndex(index_path))
+        load_ms = milliseconds(start)
+
+        start = time.perf_counter()
+        model = CollectionModel(repository, CollectionItem)
+        CollectionPage.load_items(model)
+        model_ms = milliseconds(start)
+
+        result[str(n)] = {
+            "first_load_ms": first_ms,
+            "load_ms": load_ms,
+            "model_ms": model_ms,
+            "refresh_all_ms": load_ms + model_ms,
+            "items": model.store.get_n_items(),
+        }
+    return result
+
+
+def shopping_lines(n):
+    """n ingredient lines naming about n / 4 different ingredients, so most
+    of them merge into an existing entry as a recipe's would."""
+    names = INGREDIENTS["meal"] + INGREDIENTS["cocktail"]
+    distinct = n // 4 + 1
+    lines = []
+    for i in range(n):
+        j = i % distinct
+        variety, name = divmod(j, len(names))
+        adjectives = f"{WORDS[variety % len(WORDS)]} {WORDS[variety // len(WORDS) % len(WORDS)]}".title()
+        lines.append(f"{MEASURES[i % len(MEASURES)]} {adjectives} {names[name]}".strip())
+    return lines
+
+
+def bench_shopping(sizes):
+    result = {}
+    for n in sizes:
+        batch = shopping_lines(n)
+        storage = Storage(scratch(f"shopping-{n}"))
+        repository = Repository(storage, SearchIndex(os.path.join(storage.data_dir, "index.db")))
+        for key in list(repository.shopping_list.entries):
+            repository.remove_shopping_item(key)
+        storage.flush()
+
+        start = time.perf_counter()
+        repository.add_shopping_items(batch)
+        bulk_ms = milliseconds(start)
+
+        singles = batch[:1000]
+        start = time.perf_counter()
+        for line in singles:
+            repository.add_shopping_item(line)
+        add_ms = milliseconds(start)
+
+        keys = list(repository.shopping_list.entries)
+        start = time.perf_counter()
+        for key in keys:
+            repository.remove_shopping_item(key)
+        remove_ms = milliseconds(start)
+
+        start = time.perf_counter()
+        storage.flush()
+        flush_ms = milliseconds(start)
+
+        result[str(n)] = {
+            "bulk_add_ms": bulk_ms,
+            "add_op_ms": add_ms / len(singles),
+            "remove_op_ms": remove_ms / max(len(keys), 1),
+            "flush_ms": flush_ms,
+            "entries": len(keys),
+        }
+    return result
+
+
+def rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def measure_rows(records):
+    """Python-heap and resident bytes per SearchResult built from records."""
+    gc.collect()
+    rss = rss_bytes()
+    tracemalloc.start()
+    rows = [SearchResult(Recipe.from_api(kind, data)) for kind, data in records]
+    heap, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = rss_bytes()
+    result = {"heap_bytes_per_row": heap / len(rows)}
+    if rss is not None:
+        # Includes the GObject instances, which tracemalloc can't see
+        result["rss_bytes_per_row"] = max(rss_after - rss, 0) / len(rows)
+    del rows
+    return result
+
+
+def bench_memory(rows):
+    catalog = MockCatalog(count=rows // 2)
+    full = [(kind, catalog.absolute(kind, r)) for kind in KINDS for r in catalog.records[kind]]
+    partial = []
+    for kind, data in full:
+        _, id_field, name_field, thumb_field, _, _ = KINDS[kind]
+        partial.append((kind, {f: data[f] for f in (id_field, name_field, thumb_field)}))
+    return {"full": measure_rows(full), "filter": measure_rows(partial), "rows": len(full)}
+
+
+def bench_startup(runs):
+    if not (os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY")):
+        return {"skipped": "no display, run under xvfb-run to include startup"}
+    import bench_startup as startup
+    results = [startup.run_once() for _ in range(runs)]
+    return {
+        "first_frame_ms": statistics.median(r["first_frame_ms"] for r in results),
+        "import_ms": statistics.median(r["import_ms"] for r in results),
+        "deferred_imported": sorted({m for r in results for m in r["deferred_imported"]}),
+    }
+
+
+# Output
+
+def flatten(results, prefix=""):
+    """{"a": {"b": 1}} -> {"a.b": 1}, numbers only."""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def regressions(metrics, baseline, tolerance):
+    """Timings and sizes in metrics more than tolerance worse than baseline."""
+    found = []
+    for name, value in metrics.items():
+        if not name.endswith(("_ms", "_bytes_per_row")) or name.endswith("max_ms"):
+            continue
+        old = baseline.get(name)
+        if old and value > old * (1 + tolerance):
+            found.append((name, old, value))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", help="comma-separated benchmarks to run: search, collection, shopping, memory, startup")
+    parser.add_argument("--quick", action="store_true", help="stop at 1000 recipes and shopping lines")
+    parser.add_argument("--records", type=int, default=500, help="records of each kind on the stub server")
+    parser.add_argument("--latency-ms", type=float, default=0, help="delay the stub adds to every response")
+    parser.add_argument("--startup-runs", type=int, default=3)
+    parser.add_argument("--output", help="also write the results to this file")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown against the baseline")
+    args = parser.parse_args()
+
+    selected = set(args.only.split(",")) if args.only else {"search", "collection", "shopping", "memory", "startup"}
+    limit = 1000 if args.quick else None
+    results = {}
+
+    if "search" in selected:
+        with MockServer(MockCatalog(args.records), latency_ms=args.latency_ms) as server:
+            results["search"] = bench_search(server)
+            results["search"]["stub_requests"] = server.requests
+    if "collection" in selected:
+        results["collection"] = bench_collection([n for n in COLLECTION_SIZES if not limit or n <= limit])
+    if "shopping" in selected:
+        results["shopping"] = bench_shopping([n for n in SHOPPING_SIZES if not limit or n <= limit])
+    if "memory" in selected:
+        results["memory"] = bench_memory(MEMORY_ROWS)
+    if "startup" in selected:
+        results["startup"] = bench_startup(args.startup_runs)
+
+    metrics = flatten(results)
+    report = {
+        "suite": "bistro",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+        "metrics": metrics,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["metrics"]
+        found = regressions(metrics, baseline, args.tolerance)
+        for name, old, new in found:
+            print(f"Regressed: {name} {old:.3f} -> {new:.3f}", file=sys.stderr)
+        if found:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
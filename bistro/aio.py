@@ -0,0 +1,85 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from gi.events import GLibEventLoopPolicy
+
+# Blocking work (HTTP, disk) runs here; everything else stays on the main loop
+MAX_WORKERS = 6
+
+executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="bistro-io")
+_cancel_events = set()  # One per run_io() job still on the pool
+
+
+def install():
+    """Run asyncio on the GLib main loop. Must be called before Application.run()."""
+    asyncio.set_event_loop_policy(GLibEventLoopPolicy())
+
+
+async def run_io(func, *args, **kwargs):
+    """Await func(*args, cancel=event, **kwargs) on the shared I/O pool.
+
+    If the awaiting task is cancelled the event is set, so functions that
+    honour it (net.get_bytes, ResponseCache.get_json, ...) stop early
+    instead of finishing work nobody will look at.
+    """
+    loop = asyncio.get_running_loop()
+    cancel = threading.Event()
+    call = functools.partial(func, *args, cancel=cancel, **kwargs)
+    _cancel_events.add(cancel)
+    try:
+        return await loop.run_in_executor(executor, call)
+    except asyncio.CancelledError:
+        cancel.set()
+        raise
+    finally:
+        _cancel_events.discard(cancel)
+
+
+def shutdown():
+    """Stop the I/O pool at exit.
+
+    Queued jobs are dropped and running ones are told to stop, since the
+    interpreter waits for the pool's threads before exiting and the main
+    loop won't run again to cancel their tasks.
+    """
+    for cancel in list(_cancel_events):
+        cancel.set()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def spawn(coro, name=None):
+    """Schedule coro on the main loop, logging any error it raises."""
+    task = asyncio.get_event_loop().create_task(coro, name=name)
+    task.add_done_callback(_report)
+    return task
+
+
+def _report(task):
+    if not task.cancelled() and (e := task.exception()):
+        print(f"Task {task.get_name()} failed: {e!r}")
+
+
+class TaskScope:
+    """Tasks owned by a widget, cancelled together.
+
+    Pass a widget to cancel everything automatically when it is
+    unrealized, i.e. removed from the window or the window is closed.
+    """
+
+    def __init__(self, widget=None):
+        self.tasks = set()
+        if widget is not None:
+            widget.connect("unrealize", lambda w: self.cancel())
+
+    def spawn(self, coro, name=None):
+        task = spawn(coro, name)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def cancel(self):
+        for task in list(self.tasks):
+            task.cancel()
+        self.tasks.clear()
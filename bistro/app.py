@@ -1,78 +1,39 @@
 import sys
-import os
-import json
 import gi
 
 gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
-from gi.repository import Gtk, Adw, Gdk, Gio, GLib
+from gi.repository import Gtk, Adw, Gio, GLib
 
+from bistro import aio, net, profiling, resources
+from bistro.catalog import Catalog
+from bistro.repository import Repository
+from bistro.search_index import SearchIndex
+from bistro.storage import Storage
 from bistro.window import UnifiedWindow
 
 class UnifiedApp(Adw.Application):
-    SETTINGS_FILE = os.path.join(GLib.get_user_data_dir(), "bistro", "settings.json")
-
     def __init__(self):
         super().__init__(application_id="com.github.cadmiumcmyk.Bistro", flags=0)
 
-    def load_settings(self):
-        if os.path.exists(self.SETTINGS_FILE):
-            try:
-                with open(self.SETTINGS_FILE, 'r') as f:
-                    return json.load(f)
-            except:
-                pass
-        return {}
+    def run(self, argv=None):
+        # All fetches are coroutines scheduled on the GLib main loop
+        aio.install()
+        return super().run(argv)
 
     def save_settings(self, key, value):
-        settings = self.load_settings()
-        settings[key] = value
-        
-        d = os.path.dirname(self.SETTINGS_FILE)
-        if not os.path.exists(d):
-            os.makedirs(d)
-            
-        try:
-            with open(self.SETTINGS_FILE, 'w') as f:
-                json.dump(settings, f, indent=4)
-        except Exception as e:
-            print(f"Failed to save settings: {e}")
+        Storage.get_default().set_setting(key, value)
 
+    @profiling.traced("UnifiedApp.do_startup")
     def do_startup(self):
         Adw.Application.do_startup(self)
 
-        # Load resources
-        base_path = os.path.dirname(os.path.abspath(__file__))
-        resource_path = os.path.join(base_path, "..", "bistro.gresource")
-        
-        if not os.path.exists(resource_path):
-             # Try building directory or current dir fallback
-             if os.path.exists("bistro.gresource"):
-                 resource_path = "bistro.gresource"
-
-        if os.path.exists(resource_path):
-            try:
-                resource = Gio.Resource.load(resource_path)
-                resource._register()
-            except Exception as e:
-                print(f"Failed to load resource: {e}")
-
-        # Load CSS from resource
-        css_provider = Gtk.CssProvider()
-        try:
-            css_provider.load_from_resource("/com/github/cadmiumcmyk/Bistro/style.css")
-            Gtk.StyleContext.add_provider_for_display(
-                Gdk.Display.get_default(),
-                css_provider,
-                Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION
-            )
-        except Exception as e:
-            print(f"Failed to load CSS: {e}")
+        # Loaded once; pages share it and listen for its change signals
+        self.repository = Repository()
+
+        # Bundled icons and stylesheet
+        resources.setup_display()
 
-        # Set up icon search path
-        icon_theme = Gtk.IconTheme.get_for_display(Gdk.Display.get_default())
-        icon_theme.add_resource_path("/com/github/cadmiumcmyk/Bistro")
-        
         # Setup actions
         quit_action = Gio.SimpleAction.new("quit", None)
         quit_action.connect("activate", self.on_quit)
@@ -83,8 +44,7 @@ class UnifiedApp(Adw.Application):
         self.add_action(about_action)
         
         # Theme action
-        settings = self.load_settings()
-        current_theme = settings.get("theme", "system")
+        current_theme = Storage.get_default().get_setting("theme", "system")
         
         # Apply startup theme
         manager = Adw.StyleManager.get_default()
@@ -99,12 +59,32 @@ class UnifiedApp(Adw.Application):
         theme_action.connect("activate", self.on_theme)
         self.add_action(theme_action)
 
+        # Offline catalog: mirror both databases and search them locally
+        self.catalog_task = None
+        offline = Storage.get_default().get_setting("offline_catalog", False)
+        catalog_action = Gio.SimpleAction.new_stateful("offline-catalog", None, GLib.Variant("b", offline))
+        catalog_action.connect("activate", self.on_offline_catalog)
+        self.add_action(catalog_action)
+        if offline:
+            self.set_offline_catalog(True)
+
     def do_activate(self):
         win = self.get_active_window()
         if not win:
             win = UnifiedWindow(application=self)
         win.present()
 
+    def do_shutdown(self):
+        # A catalog sync can take minutes; don't keep the process alive for it
+        if self.catalog_task:
+            self.catalog_task.cancel()
+            self.catalog_task = None
+        aio.shutdown()
+        # Commit whatever the writers still have queued
+        Storage.get_default().flush()
+        SearchIndex.get_default().flush()
+        Adw.Application.do_shutdown(self)
+
     def on_quit(self, action, param):
         self.quit()
 
@@ -116,8 +96,16 @@ class UnifiedApp(Adw.Application):
         dialog.set_license_type(Gtk.License.MIT_X11)
         dialog.set_comments("A simple app to find drinks and recipes.")
         dialog.set_website("https://github.com/cadmium-cmyk/Bistro/")
+        dialog.set_debug_info(self.get_debug_info())
         dialog.present()
 
+    def get_debug_info(self):
+        lines = ["Network latency (ms):"]
+        for host, s in net.stats.summary().items():
+            lines.append(f"  {host}: {s['count']} requests, {s['failures']} failed, "
+                         f"mean {s['mean']:.0f}, p50 {s['p50']:.0f}, p95 {s['p95']:.0f}, max {s['max']:.0f}")
+        return "\n".join(lines)
+
     def on_theme(self, action, param):
         action.set_state(param)
         val = param.get_string()
@@ -131,6 +119,32 @@ class UnifiedApp(Adw.Application):
         
         self.save_settings("theme", val)
 
+    def on_offline_catalog(self, action, param):
+        enabled = not action.get_state().get_boolean()
+        action.set_state(GLib.Variant("b", enabled))
+        self.save_settings("offline_catalog", enabled)
+        self.set_offline_catalog(enabled)
+
+    def set_offline_catalog(self, enabled):
+        Catalog.get_default().enabled = enabled
+        if self.catalog_task:
+            self.catalog_task.cancel()
+            self.catalog_task = None
+        if enabled:
+            # Only letters older than Catalog.MAX_AGE are fetched again
+            self.catalog_task = aio.spawn(self.sync_catalog(), name="catalog sync")
+
+    async def sync_catalog(self):
+        try:
+            result = await aio.run_io(Catalog.get_default().sync)
+        except net.Cancelled:
+            return
+        except Exception as e:
+            print(f"Catalog sync failed: {e}")
+            return
+        for kind, (changed, removed) in result.items():
+            print(f"Catalog: {kind}: {changed} updated, {removed} removed")
+
 if __name__ == "__main__":
     app = UnifiedApp()
     sys.exit(app.run(sys.argv))
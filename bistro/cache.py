@@ -0,0 +1,212 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from gi.repository import GLib
+
+from bistro import aio, net, profiling
+
+DAY = 24 * 60 * 60
+
+# Seconds an entry is considered fresh, by API endpoint.
+# A TTL of 0 means the endpoint is never cached.
+ENDPOINT_TTLS = {
+    "lookup.php": 90 * DAY,
+    "list.php": 7 * DAY,
+    "search.php": 1 * DAY,
+    "filter.php": 1 * DAY,
+    "random.php": 0,
+}
+DEFAULT_TTL = 1 * DAY
+
+
+def normalize_url(url):
+    """Return a canonical form of url so equivalent lookups share an entry."""
+    parts = urlsplit(url.strip())
+    query = sorted((k, v.strip().lower()) for k, v in parse_qsl(parts.query, keep_blank_values=True))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, urlencode(query), ""))
+
+
+def ttl_for(url):
+    endpoint = urlsplit(url).path.rsplit("/", 1)[-1]
+    return ENDPOINT_TTLS.get(endpoint, DEFAULT_TTL)
+
+
+class ResponseCache:
+    """On-disk cache of JSON API responses, shared by every page.
+
+    Entries live in one file each under the user cache directory, named by
+    a hash of the normalized URL. The file modification time doubles as the
+    last access time, so least recently used entries are evicted first once
+    the directory grows past MAX_BYTES.
+    """
+
+    CACHE_DIR = os.path.join(GLib.get_user_cache_dir(), "bistro", "responses")
+    MAX_BYTES = 32 * 1024 * 1024
+
+    _default = None
+
+    @classmethod
+    def get_default(cls):
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.cache_dir = cache_dir or self.CACHE_DIR
+        self.max_bytes = max_bytes or self.MAX_BYTES
+        self.lock = threading.Lock()
+        self.index = None  # key -> size, oldest access first
+        self.total_bytes = 0
+        self.revalidating = set()
+
+    def ensure_index(self):
+        if self.index is not None:
+            return
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for e in it:
+                if e.name.endswith(".json"):
+                    st = e.stat()
+                    entries.append((st.st_mtime, e.name[:-5], st.st_size))
+        entries.sort()
+
+        self.index = OrderedDict()
+        self.total_bytes = 0
+        for _, key, size in entries:
+            self.index[key] = size
+            self.total_bytes += size
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def read(self, key):
+        with self.lock:
+            self.ensure_index()
+            if key not in self.index:
+                return None
+            self.index.move_to_end(key)
+        path = self.path_for(key)
+        try:
+            with open(path, 'r') as f:
+                entry = json.load(f)
+            os.utime(path)
+            return entry
+        except Exception:
+            self.forget(key)
+            return None
+
+    @profiling.traced()
+    def write(self, key, url, body):
+        data = json.dumps({"url": url, "fetched": time.time(), "body": body}, separators=(",", ":"))
+        path = self.path_for(key)
+        with self.lock:
+            self.ensure_index()
+            # Written whole or not at all, so a crash never leaves half an entry
+            tmp = f"{path}.tmp"
+            try:
+                with open(tmp, 'w') as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            except Exception as e:
+                print(f"Cache: failed to write {url}: {e}")
+                return
+            self.total_bytes += len(data) - self.index.get(key, 0)
+            self.index[key] = len(data)
+            self.index.move_to_end(key)
+            self.evict()
+
+    def forget(self, key):
+        with self.lock:
+            if self.index and key in self.index:
+                self.total_bytes -= self.index.pop(key)
+        try:
+            os.remove(self.path_for(key))
+        except OSError:
+            pass
+
+    def evict(self):
+        # Caller holds self.lock
+        while self.total_bytes > self.max_bytes and len(self.index) > 1:
+            key, size = self.index.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.remove(self.path_for(key))
+            except OSError:
+                pass
+
+    def download(self, url, cancel=None):
+        return net.get_json(url, cancel)
+
+    def get_json(self, url, stale_while_revalidate=True, cancel=None):
+        """Return the decoded JSON body for url, from cache when possible.
+
+        Fresh entries are returned without touching the network. Expired
+        entries are returned immediately when stale_while_revalidate is set,
+        while the shared I/O pool refreshes them. If the network is
+        unreachable any cached copy is returned, however old.
+
+        cancel is an optional threading.Event that abandons the download.
+        """
+        ttl = ttl_for(url)
+        if ttl <= 0:
+            return self.download(url, cancel)
+
+        normalized = normalize_url(url)
+        key = hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+        entry = self.read(key)
+
+        if entry is not None:
+            age = time.time() - entry.get("fetched", 0)
+            if age < ttl:
+                return entry["body"]
+            if stale_while_revalidate:
+                self.revalidate(key, url)
+                return entry["body"]
+
+        try:
+            body = self.download(url, cancel)
+        except net.Cancelled:
+            raise
+        except Exception:
+            if entry is not None:
+                return entry["body"]
+            raise
+
+        self.write(key, normalized, body)
+        return body
+
+    def revalidate(self, key, url):
+        with self.lock:
+            if key in self.revalidating:
+                return
+            self.revalidating.add(key)
+
+        def worker():
+            try:
+                self.write(key, normalize_url(url), self.download(url))
+            except Exception as e:
+                print(f"Cache: revalidation of {url} failed: {e}")
+            finally:
+                with self.lock:
+                    self.revalidating.discard(key)
+
+        aio.executor.submit(worker)
+
+    def clear(self):
+        with self.lock:
+            self.ensure_index()
+            for key in list(self.index):
+                try:
+                    os.remove(self.path_for(key))
+                except OSError:
+                    pass
+            self.index.clear()
+            self.total_bytes = 0
@@ -0,0 +1,230 @@
+import hashlib
+import json
+import os
+import sqlite3
+import string
+import threading
+import time
+
+from gi.repository import GLib
+
+from bistro import net
+from bistro.model import Recipe
+
+DAY = 24 * 60 * 60
+
+# kind -> (API base URL, response key)
+SOURCES = {
+    "meal": ("https://www.themealdb.com/api/json/v1/1", "meals"),
+    "cocktail": ("https://www.thecocktaildb.com/api/json/v1/1", "drinks"),
+}
+
+# search.php?f= takes a single first letter or digit
+LETTERS = string.ascii_lowercase + string.digits
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    kind TEXT NOT NULL,
+    id TEXT NOT NULL,
+    letter TEXT NOT NULL,
+    name TEXT NOT NULL COLLATE NOCASE,
+    category TEXT COLLATE NOCASE,
+    digest TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (kind, id)
+);
+CREATE INDEX IF NOT EXISTS records_letter ON records (kind, letter);
+CREATE INDEX IF NOT EXISTS records_category ON records (kind, category);
+CREATE TABLE IF NOT EXISTS ingredients (
+    kind TEXT NOT NULL,
+    id TEXT NOT NULL,
+    ingredient TEXT NOT NULL COLLATE NOCASE
+);
+CREATE INDEX IF NOT EXISTS ingredients_name ON ingredients (kind, ingredient);
+CREATE INDEX IF NOT EXISTS ingredients_id ON ingredients (kind, id);
+CREATE TABLE IF NOT EXISTS letters (
+    kind TEXT NOT NULL,
+    letter TEXT NOT NULL,
+    synced_at REAL NOT NULL,
+    PRIMARY KEY (kind, letter)
+);
+"""
+
+
+class RateLimiter:
+    """Spaces out calls so at most rate happen per second."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_at = 0
+        self.lock = threading.Lock()
+
+    def wait(self, cancel=None):
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_at - now
+            self.next_at = max(now, self.next_at) + self.interval
+        if delay > 0:
+            if cancel is not None:
+                if cancel.wait(delay):
+                    raise net.Cancelled("rate limit wait")
+            else:
+                time.sleep(delay)
+
+
+class Catalog:
+    """Optional offline mirror of the full TheMealDB and TheCocktailDB
+    catalogs.
+
+    sync() walks search.php?f=<letter> for every letter and digit, which
+    returns complete records, and stores them in an SQLite database in the
+    user data directory as model.Recipe dicts. Requests are rate limited. Each letter is
+    committed as it finishes, so an interrupted sync resumes where it
+    stopped. A letter is only fetched again once it is older than max_age,
+    and only records whose content changed are rewritten. Once a kind is
+    synced, Name, Ingredient and Category searches are answered locally.
+
+    base_urls overrides SOURCES, e.g. to crawl a local stub server.
+    """
+
+    DB_FILE = os.path.join(GLib.get_user_data_dir(), "bistro", "catalog.db")
+    REQUESTS_PER_SECOND = 2
+    MAX_AGE = 7 * DAY
+
+    _default = None
+
+    @classmethod
+    def get_default(cls):
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    def __init__(self, path=None, base_urls=None, rate=None):
+        self.path = path or self.DB_FILE
+        d = os.path.dirname(self.path)
+        if d and not os.path.exists(d):
+            os.makedirs(d)
+        self.base_urls = {kind: src[0] for kind, src in SOURCES.items()}
+        self.base_urls.update(base_urls or {})
+        self.limiter = RateLimiter(self.REQUESTS_PER_SECOND if rate is None else rate)
+        self.enabled = False  # Answer searches locally; set from the app setting
+        self.generation = 0  # Bumped whenever records change
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    # Sync
+
+    def sync(self, kinds=None, max_age=None, cancel=None):
+        """Fetch every letter not synced within max_age seconds.
+
+        Returns {kind: (changed, removed)} record counts.
+        """
+        max_age = self.MAX_AGE if max_age is None else max_age
+        result = {}
+        for kind in kinds or SOURCES:
+            fresh = self.fresh_letters(kind, max_age)
+            changed = removed = 0
+            for letter in LETTERS:
+                if letter in fresh:
+                    continue
+                c, r = self.sync_letter(kind, letter, cancel)
+                changed += c
+                removed += r
+            result[kind] = (changed, removed)
+        return result
+
+    def fresh_letters(self, kind, max_age):
+        cutoff = time.time() - max_age
+        with self.lock:
+            rows = self.conn.execute("SELECT letter FROM letters WHERE kind = ? AND synced_at > ?", (kind, cutoff))
+            return {letter for (letter,) in rows}
+
+    def sync_letter(self, kind, letter, cancel=None):
+        _, key = SOURCES[kind]
+        self.limiter.wait(cancel)
+        records = net.get_json(f"{self.base_urls[kind]}/search.php?f={letter}", cancel) or {}
+        records = records.get(key) or []
+
+        with self.lock, self.conn:
+            known = dict(self.conn.execute("SELECT id, digest FROM records WHERE kind = ? AND letter = ?", (kind, letter)))
+            seen = set()
+            changed = 0
+            for data in records:
+                # The digest is of the record as served, so unchanged records are skipped
+                digest = hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()
+                recipe = Recipe.from_api(kind, data)
+                seen.add(recipe.id)
+                if known.get(recipe.id) == digest:
+                    continue
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO records (kind, id, letter, name, category, digest, data) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (kind, recipe.id, letter, recipe.name, recipe.category or None, digest, json.dumps(recipe.to_dict())),
+                )
+                self.conn.execute("DELETE FROM ingredients WHERE kind = ? AND id = ?", (kind, recipe.id))
+                self.conn.executemany(
+                    "INSERT INTO ingredients (kind, id, ingredient) VALUES (?, ?, ?)",
+                    [(kind, recipe.id, name) for name in {ing.name for ing in recipe.ingredients}],
+                )
+                changed += 1
+
+            gone = [r_id for r_id in known if r_id not in seen]
+            for r_id in gone:
+                self.conn.execute("DELETE FROM records WHERE kind = ? AND id = ?", (kind, r_id))
+                self.conn.execute("DELETE FROM ingredients WHERE kind = ? AND id = ?", (kind, r_id))
+
+            self.conn.execute("INSERT OR REPLACE INTO letters (kind, letter, synced_at) VALUES (?, ?, ?)", (kind, letter, time.time()))
+            if changed or gone:
+                self.generation += 1
+        return changed, len(gone)
+
+    def is_synced(self, kind):
+        """True once every letter of kind has been fetched at least once."""
+        with self.lock:
+            (n,) = self.conn.execute("SELECT COUNT(*) FROM letters WHERE kind = ?", (kind,)).fetchone()
+        return n == len(LETTERS)
+
+    def is_ready(self, kind):
+        return self.enabled and self.is_synced(kind)
+
+    # Queries
+
+    def search(self, kind, mode, query, limit=500):
+        """Return Recipes of kind matching query.
+
+        mode is "Name" (substring of the name), "Ingredient" (exact
+        ingredient) or "Category" (exact category), as on the search pages.
+        """
+        query = query.strip()
+        if mode == "Ingredient":
+            sql = ("SELECT r.data FROM ingredients i JOIN records r ON r.kind = i.kind AND r.id = i.id "
+                   "WHERE i.kind = ? AND i.ingredient = ? ORDER BY r.name LIMIT ?")
+            args = (kind, query.replace("_", " "), limit)
+        elif mode == "Category":
+            sql = "SELECT data FROM records WHERE kind = ? AND category = ? ORDER BY name LIMIT ?"
+            args = (kind, query, limit)
+        else:
+            escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            sql = "SELECT data FROM records WHERE kind = ? AND name LIKE ? ESCAPE '\\' ORDER BY name LIMIT ?"
+            args = (kind, f"%{escaped}%", limit)
+        with self.lock:
+            rows = self.conn.execute(sql, args).fetchall()
+        return [Recipe.from_dict(kind, json.loads(data)) for (data,) in rows]
+
+    def records(self, kind):
+        with self.lock:
+            rows = self.conn.execute("SELECT data FROM records WHERE kind = ?", (kind,)).fetchall()
+        return [Recipe.from_dict(kind, json.loads(data)) for (data,) in rows]
+
+    def random(self, kind):
+        with self.lock:
+            row = self.conn.execute("SELECT data FROM records WHERE kind = ? ORDER BY random() LIMIT 1", (kind,)).fetchone()
+        return [Recipe.from_dict(kind, json.loads(row[0]))] if row else []
+
+    def clear(self):
+        with self.lock, self.conn:
+            for table in ("records", "ingredients", "letters"):
+                self.conn.execute(f"DELETE FROM {table}")
+            self.generation += 1
@@ -0,0 +1,224 @@
+import asyncio
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+import gi
+
+gi.require_version('Gtk', '4.0')
+gi.require_version('Gdk', '4.0')
+from gi.repository import Gtk, Gdk, GLib
+
+from bistro import aio, net, profiling
+from bistro.thumbnails import ThumbnailStore
+
+
+class ImageLoader:
+    """Shared thumbnail loader used by every page.
+
+    Each fetch is a task on the main loop that waits for one of MAX_WORKERS
+    slots and a per-host slot before running the download on the shared
+    I/O pool, so the number of concurrent connections stays bounded. Images
+    are persisted pre-scaled in the ThumbnailStore so later sessions read
+    them from disk instead of the network. Decoding happens on the I/O pool
+    too, so the main thread only receives finished textures, and textures
+    that finish within a frame are shown together, just before it is drawn.
+    Decoded textures are kept in an LRU bounded by their pixel size, so a
+    thumbnail is only downloaded and decoded once per session no matter how
+    many rows show it.
+
+    Fetches are deferred until the target widget is mapped (for rows, when
+    they are expanded) and scrolled into view, and every request belongs to
+    an owner whose outstanding requests can be dropped with cancel().
+
+    Everything except fetch() runs on the main thread.
+    """
+
+    MAX_WORKERS = 4
+    MAX_PER_HOST = 2
+    MAX_TEXTURE_BYTES = 64 * 1024 * 1024
+
+    _default = None
+
+    @classmethod
+    def get_default(cls):
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    def __init__(self, max_workers=None, max_per_host=None, max_texture_bytes=None):
+        self.workers = asyncio.Semaphore(max_workers or self.MAX_WORKERS)
+        self.max_per_host = max_per_host or self.MAX_PER_HOST
+        self.max_texture_bytes = max_texture_bytes or self.MAX_TEXTURE_BYTES
+        self.host_slots = {}  # host -> asyncio.Semaphore
+        self.textures = OrderedDict()  # url -> (texture, bytes)
+        self.texture_bytes = 0
+        self.pending = {}  # url -> widgets waiting for it
+        self.tasks = {}  # url -> waiting or running fetch task
+        self.deferred = {}  # widget -> (url, owner, [(object, handler id)])
+        self.active = {}  # widget -> (url, owner)
+        self.owners = {}  # owner -> widgets with deferred or active requests
+        self.ready = {}  # widget -> texture to show at the next flush
+        self.flush_scheduled = False
+
+    def load(self, url, widget, owner=None):
+        """Show the image at url in widget, a Gtk.Picture, once it is visible."""
+        self.ready.pop(widget, None)
+        if texture := self.lookup(url):
+            widget.set_paintable(texture)
+            return
+
+        self.forget(widget)
+        handlers = [(widget, widget.connect("map", self.on_widget_mapped))]
+        self.deferred[widget] = (url, owner, handlers)
+        self.owners.setdefault(owner, set()).add(widget)
+        if widget.get_mapped():
+            self.on_widget_mapped(widget)
+
+    def on_widget_mapped(self, widget):
+        if widget not in self.deferred:
+            return
+        scroll = widget.get_ancestor(Gtk.ScrolledWindow)
+        if scroll is None or self.in_viewport(widget, scroll):
+            self.start(widget)
+            return
+
+        url, owner, handlers = self.deferred[widget]
+        if len(handlers) == 1:
+            adj = scroll.get_vadjustment()
+            handlers.append((adj, adj.connect("value-changed", self.on_scrolled, widget, scroll)))
+
+    def on_scrolled(self, adj, widget, scroll):
+        if widget.get_mapped() and self.in_viewport(widget, scroll):
+            self.start(widget)
+
+    def in_viewport(self, widget, scroll):
+        ok, bounds = widget.compute_bounds(scroll)
+        if not ok:
+            return False
+        # Start a little ahead of the visible area so images are ready on arrival
+        margin = scroll.get_height() / 2
+        top = bounds.get_y()
+        return top + bounds.get_height() >= -margin and top <= scroll.get_height() + margin
+
+    def start(self, widget):
+        url, owner, handlers = self.deferred.pop(widget)
+        for obj, handler_id in handlers:
+            obj.disconnect(handler_id)
+        self.active[widget] = (url, owner)
+
+        if url in self.pending:
+            self.pending[url].append(widget)
+            return
+
+        self.pending[url] = [widget]
+        self.tasks[url] = aio.spawn(self.load_image(url), name=f"image {url}")
+
+    def forget(self, widget):
+        if widget in self.deferred:
+            url, owner, handlers = self.deferred.pop(widget)
+            for obj, handler_id in handlers:
+                obj.disconnect(handler_id)
+        elif widget in self.active:
+            url, owner = self.active.pop(widget)
+            waiting = self.pending.get(url, [])
+            if widget in waiting:
+                waiting.remove(widget)
+            if not waiting and url in self.pending:
+                # Nobody wants it any more; abandon the download
+                del self.pending[url]
+                if task := self.tasks.pop(url, None):
+                    task.cancel()
+        else:
+            return
+        if widgets := self.owners.get(owner):
+            widgets.discard(widget)
+            if not widgets:
+                del self.owners[owner]
+
+    def cancel(self, owner):
+        """Drop every deferred and outstanding request made on behalf of owner."""
+        for widget in list(self.owners.get(owner, ())):
+            self.forget(widget)
+
+    def lookup(self, url):
+        entry = self.textures.get(url)
+        if entry is None:
+            return None
+        self.textures.move_to_end(url)
+        return entry[0]
+
+    def store(self, url, texture):
+        size = texture.get_width() * texture.get_height() * 4
+        if url in self.textures:
+            self.texture_bytes -= self.textures.pop(url)[1]
+        self.textures[url] = (texture, size)
+        self.texture_bytes += size
+
+        while self.texture_bytes > self.max_texture_bytes and len(self.textures) > 1:
+            _, (_, old_size) = self.textures.popitem(last=False)
+            self.texture_bytes -= old_size
+
+    def slot_for(self, url):
+        host = urlsplit(url).netloc
+        if host not in self.host_slots:
+            self.host_slots[host] = asyncio.Semaphore(self.max_per_host)
+        return self.host_slots[host]
+
+    @profiling.traced()
+    async def load_image(self, url):
+        texture = None
+        try:
+            async with self.workers, self.slot_for(url):
+                texture = await aio.run_io(self.fetch, url)
+        except Exception as e:
+            print(f"Image load failed for {url}: {e}")
+        self.set_image_texture(url, texture)
+
+    def fetch(self, url, cancel=None):
+        # Runs on the I/O pool. The stored thumbnail is already at row size,
+        # and textures are immutable, so it is decoded here as well.
+        store = ThumbnailStore.get_default()
+        data = store.read(url)
+        if data is None:
+            data = store.store(url, net.get_bytes(url, cancel))
+        with profiling.span("ImageLoader.decode"):
+            return Gdk.Texture.new_from_bytes(GLib.Bytes.new(data))
+
+    @profiling.traced()
+    def set_image_texture(self, url, texture):
+        self.tasks.pop(url, None)
+        widgets = self.pending.pop(url, [])
+        for widget in widgets:
+            self.forget(widget)
+        if texture is None:
+            return
+
+        self.store(url, texture)
+        for widget in widgets:
+            self.ready[widget] = texture
+        if widgets and not self.flush_scheduled:
+            self.flush_scheduled = True
+            # Flush on the window's next frame, just before layout and paint,
+            # or when idle if no frame is coming
+            root = widgets[0].get_root()
+            if root is not None and root.get_mapped():
+                root.add_tick_callback(self.on_tick)
+            else:
+                GLib.idle_add(self.flush)
+
+    def on_tick(self, widget, clock):
+        self.flush()
+        return GLib.SOURCE_REMOVE
+
+    def flush(self):
+        """Show every texture that finished since the last flush."""
+        self.flush_scheduled = False
+        ready, self.ready = self.ready, {}
+        with profiling.span("ImageLoader.flush", textures=len(ready)):
+            for widget, texture in ready.items():
+                widget.set_paintable(texture)
+        return GLib.SOURCE_REMOVE
+
+    def clear(self):
+        self.textures.clear()
+        self.texture_bytes = 0
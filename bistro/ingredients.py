@@ -0,0 +1,287 @@
+import re
+import unicodedata
+from dataclasses import dataclass
+from fractions import Fraction
+from functools import lru_cache
+
+# unit -> (dimension, size in the dimension's base unit: ml, g or itself)
+UNITS = {
+    "ml": ("volume", 1.0),
+    "cl": ("volume", 10.0),
+    "dl": ("volume", 100.0),
+    "l": ("volume", 1000.0),
+    "tsp": ("volume", 4.92892),
+    "tbsp": ("volume", 14.7868),
+    "fl oz": ("volume", 29.5735),
+    "cup": ("volume", 236.588),
+    "pint": ("volume", 473.176),
+    "quart": ("volume", 946.353),
+    "gallon": ("volume", 3785.41),
+    "shot": ("volume", 44.3603),
+    "g": ("mass", 1.0),
+    "mg": ("mass", 0.001),
+    "kg": ("mass", 1000.0),
+    "oz": ("mass", 28.3495),
+    "lb": ("mass", 453.592),
+    # Only merged with themselves
+    "dash": ("dash", 1.0),
+    "pinch": ("pinch", 1.0),
+    "splash": ("splash", 1.0),
+    "clove": ("clove", 1.0),
+    "slice": ("slice", 1.0),
+    "can": ("can", 1.0),
+    "tin": ("tin", 1.0),
+    "bunch": ("bunch", 1.0),
+    "sprig": ("sprig", 1.0),
+    "handful": ("handful", 1.0),
+    "stick": ("stick", 1.0),
+    "package": ("package", 1.0),
+}
+
+# Unit names that take an "s" above one: "2 cloves", but "2 tbsp"
+PLURAL_UNITS = {unit: unit + ("es" if unit.endswith(("sh", "ch")) else "s")
+                for unit in ("cup", "pint", "quart", "gallon", "shot", "dash", "pinch", "splash", "clove",
+                             "slice", "can", "tin", "bunch", "sprig", "handful", "stick", "package")}
+
+# Merged amounts are rounded to these steps: "128 g sugar", not "128 1/3 g"
+ROUNDING = {"ml": 1, "cl": 0.5, "dl": 0.25, "l": 0.05, "mg": 1, "g": 1, "kg": 0.05,
+            "oz": 0.25, "fl oz": 0.25, "lb": 0.25}
+
+# Drink recipes write fluid ounces as "oz", so oz counts as fl oz next to a volume
+VOLUME_UNITS = {"oz": "fl oz"}
+
+UNIT_ALIASES = {
+    "milliliter": "ml", "millilitre": "ml", "cl": "cl", "centiliter": "cl", "dl": "dl",
+    "liter": "l", "litre": "l", "ltr": "l",
+    "teaspoon": "tsp", "tsp": "tsp",
+    "tablespoon": "tbsp", "tbsp": "tbsp", "tbs": "tbsp", "tbl": "tbsp",
+    "fl oz": "fl oz", "fluid ounce": "fl oz", "floz": "fl oz",
+    "cup": "cup",
+    "pint": "pint", "pt": "pint", "quart": "quart", "qt": "quart", "gallon": "gallon", "gal": "gallon",
+    "shot": "shot", "jigger": "shot",
+    "gram": "g", "gramme": "g", "gr": "g", "milligram": "mg", "kilogram": "kg", "kilo": "kg",
+    "ounce": "oz", "oz": "oz", "pound": "lb", "lb": "lb", "lbs": "lb",
+    "dash": "dash", "pinch": "pinch", "splash": "splash",
+    "clove": "clove", "slice": "slice", "can": "can", "tin": "tin",
+    "bunch": "bunch", "sprig": "sprig", "handful": "handful", "stick": "stick",
+    "package": "package", "pack": "package", "packet": "package", "pkg": "package",
+}
+UNIT_ALIASES.update({unit: unit for unit in UNITS})
+
+# Plurals and trailing dots of the aliases: "cups", "tbsps", "tsp."
+_UNIT_WORDS = {}
+for _alias, _unit in UNIT_ALIASES.items():
+    for _form in (_alias, _alias + "s", _alias + "es"):
+        _UNIT_WORDS[_form] = _unit
+
+UNICODE_FRACTIONS = {
+    "½": "1/2", "⅓": "1/3", "⅔": "2/3", "¼": "1/4", "¾": "3/4", "⅕": "1/5",
+    "⅛": "1/8", "⅜": "3/8", "⅝": "5/8", "⅞": "7/8", "⅙": "1/6", "⅚": "5/6",
+}
+FRACTION_RE = re.compile("|".join(UNICODE_FRACTIONS))
+NUMBER = r"\d+\s+\d+/\d+|\d+/\d+|\d+(?:[.,]\d+)?"
+QUANTITY_RE = re.compile(rf"\s*({NUMBER})(?:\s*(?:-|–|to)\s*({NUMBER}))?\s*", re.IGNORECASE)
+UNIT_RE = re.compile(r"(fl\.?\s*oz|fluid ounces?|[a-z]+)\.?(?:\s+|$)", re.IGNORECASE)
+NOTE_RE = re.compile(r"^\([^)]*\)\s*|\s*(?:\([^)]*\)|,.*)$")
+LEADING_NOTE_RE = re.compile(r"^\([^)]*\)\s*")
+WORD_RE = re.compile(r"[a-z]+")
+
+# Shown instead of decimals when a quantity is close to one
+NICE_FRACTIONS = [Fraction(n, d) for d in (2, 3, 4, 8) for n in range(1, d)]
+
+
+def singular(word):
+    if len(word) > 3:
+        if word.endswith("ies"):
+            return word[:-3] + "y"
+        if word.endswith("oes"):
+            return word[:-2]
+        if word.endswith("s") and not word.endswith("ss"):
+            return word[:-1]
+    return word
+
+
+@lru_cache(maxsize=4096)
+def normalize_ingredient(name):
+    """Lowercase, unaccented, singular words: "Cherry Tomatoes" -> "cherry tomato"."""
+    text = unicodedata.normalize("NFKD", name.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(singular(w) for w in WORD_RE.findall(text))
+
+
+def pluralize(name):
+    """Make the last word of name plural: "Egg" -> "Eggs", "Cherry" -> "Cherries"."""
+    head, _, word = name.rpartition(" ")
+    lower = word.lower()
+    if not lower.isalpha() or singular(lower) != lower:
+        return name
+    if lower.endswith(("s", "x", "z", "ch", "sh")):
+        word += "es"
+    elif lower.endswith("y") and lower[-2:-1] not in "aeiou":
+        word = word[:-1] + "ies"
+    else:
+        word += "s"
+    return f"{head} {word}" if head else word
+
+
+def parse_number(text):
+    text = text.replace(",", ".")
+    if " " in text:
+        whole, frac = text.split(None, 1)
+        return float(whole) + float(Fraction(frac))
+    if "/" in text:
+        return float(Fraction(text))
+    return float(text)
+
+
+def round_quantity(quantity, unit):
+    """Round quantity to the precision that suits unit. Amounts smaller
+    than one step, like "0.3 g saffron", are left as they are."""
+    step = ROUNDING.get(unit)
+    if not step or quantity < step:
+        return quantity
+    return round(quantity / step) * step
+
+
+def format_quantity(quantity):
+    """Format 1.5 as "1 1/2", 0.333 as "1/3" and 2.0 as "2"."""
+    whole = int(quantity)
+    rest = quantity - whole
+    if rest < 0.01:
+        return str(whole)
+    if rest > 0.99:
+        return str(whole + 1)
+    frac = min(NICE_FRACTIONS, key=lambda f: abs(f - rest))
+    if abs(frac - rest) > 0.02:
+        return f"{quantity:.2f}".rstrip("0").rstrip(".")
+    return f"{whole} {frac}" if whole else str(frac)
+
+
+@dataclass(slots=True, frozen=True)
+class ParsedIngredient:
+    """Quantity, unit and name of an ingredient line.
+
+    quantity is None when the line has none ("salt to taste") and unit is
+    "" for plain counts ("2 eggs"). key is the canonical name, the same for
+    "Egg" and "eggs", and is what lines are compared by.
+    """
+
+    name: str
+    quantity: float | None = None
+    unit: str = ""
+
+    @property
+    def key(self):
+        return normalize_ingredient(self.name)
+
+    @property
+    def dimension(self):
+        return UNITS[self.unit][0] if self.unit else ""
+
+    @property
+    def measure(self):
+        if self.quantity is None:
+            return self.unit
+        unit = PLURAL_UNITS.get(self.unit, self.unit) if self.quantity > 1 else self.unit
+        return f"{format_quantity(round_quantity(self.quantity, self.unit))} {unit}".strip()
+
+    def __str__(self):
+        name = self.name
+        if not self.unit and self.quantity is not None and self.quantity > 1:
+            name = pluralize(name)
+        return f"{self.measure} {name}".strip()
+
+    def convert(self, unit):
+        """Return this amount in unit, or None if the units don't mix."""
+        if self.quantity is None or unit == self.unit:
+            return self.quantity
+        if not self.unit or not unit:
+            return None
+        source = self.unit
+        if UNITS[unit][0] != UNITS[source][0]:
+            source, unit = VOLUME_UNITS.get(source, source), VOLUME_UNITS.get(unit, unit)
+            if UNITS[unit][0] != UNITS[source][0]:
+                return None
+        return self.quantity * UNITS[source][1] / UNITS[unit][1]
+
+    def combine(self, other):
+        """Return the sum of two amounts of the same ingredient, in this
+        one's unit, or None if they can't be added up."""
+        if other.key != self.key:
+            return None
+        if self.quantity is None and other.quantity is None and self.unit == other.unit:
+            return self
+        if self.quantity is None or other.quantity is None:
+            return None
+        quantity = other.convert(self.unit)
+        if quantity is None:
+            return None
+        return ParsedIngredient(self.name, self.quantity + quantity, self.unit)
+
+
+def split_amount(text, unit_only=False):
+    """Return (quantity, unit, rest) read from the start of text.
+
+    A unit word is only taken when something follows it, unless unit_only
+    is set, as for a measure given apart from its ingredient ("2 oz").
+    """
+    rest = FRACTION_RE.sub(lambda m: " " + UNICODE_FRACTIONS[m.group()], text).strip()
+    quantity = None
+    unit = ""
+
+    if m := QUANTITY_RE.match(rest):
+        try:
+            quantity = parse_number(m.group(2) or m.group(1))
+            rest = rest[m.end():]
+        except (ValueError, ZeroDivisionError):
+            quantity = None
+
+    # A note between the amount and the unit: "1 (400g) can tomatoes"
+    rest = LEADING_NOTE_RE.sub("", rest)
+    if m := UNIT_RE.match(rest):
+        word = re.sub(r"[\s.]+", " ", m.group(1).lower()).strip()
+        # A lone letter is only a unit right after a number: "2 l water" but not "l"
+        found = _UNIT_WORDS.get(word)
+        if found and (len(word) > 1 or quantity is not None) and (unit_only or rest[m.end():].strip()):
+            unit = found
+            rest = rest[m.end():]
+            if rest.lower().startswith("of "):
+                rest = rest[3:]
+    return quantity, unit, rest
+
+
+def clean_name(name):
+    """Drop notes such as "(400g)" or ", finely chopped" from a name."""
+    return NOTE_RE.sub("", name).strip() or name.strip()
+
+
+@lru_cache(maxsize=16384)
+def parse_ingredient(text):
+    """Parse "1 1/2 oz Lime juice" into ParsedIngredient("Lime juice", 1.5, "oz").
+
+    Handles fractions, mixed and unicode fractions, decimals with either
+    separator and ranges, which count as their upper bound. Unit names are
+    canonicalized ("Tablespoons" -> "tbsp"), and notes such as "(400g)" or
+    ", finely chopped" are dropped from the name. Lines are cached, so
+    parsing the same line again is a dictionary lookup.
+    """
+    quantity, unit, rest = split_amount(text)
+    return ParsedIngredient(clean_name(rest) or text.strip(), quantity, unit)
+
+
+@lru_cache(maxsize=16384)
+def parse_measured(measure, name):
+    """Parse an API ingredient, whose measure ("1 1/2 oz") and name ("Lime
+    juice") are separate fields.
+
+    Only the amount and unit are read from the measure. The rest of it,
+    like "to taste" or "chopped", is left out of the name, so the name and
+    key come from the ingredient field alone.
+    """
+    quantity, unit, _ = split_amount(measure, unit_only=True)
+    return ParsedIngredient(clean_name(name), quantity, unit)
+
+
+def parse_ingredients(lines):
+    """Parse many lines at once, e.g. a scraped recipe or an import."""
+    return [parse_ingredient(line) for line in lines if line and line.strip()]
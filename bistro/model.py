@@ -0,0 +1,133 @@
+from dataclasses import dataclass
+
+from bistro.ingredients import parse_ingredient, parse_measured
+
+# kind -> (id field, name field, thumbnail field, ingredient slots) of the API records
+API_FIELDS = {
+    "cocktail": ("idDrink", "strDrink", "strDrinkThumb", 15),
+    "meal": ("idMeal", "strMeal", "strMealThumb", 20),
+}
+
+# Bumped when the stored form of Recipe.to_dict() changes
+FORMAT = 1
+
+
+@dataclass(slots=True)
+class Ingredient:
+    name: str
+    measure: str = ""
+
+    def __str__(self):
+        return f"{self.measure} {self.name}".strip()
+
+    @property
+    def parsed(self):
+        # Custom recipes keep the whole line in name
+        if self.measure:
+            return parse_measured(self.measure, self.name)
+        return parse_ingredient(self.name)
+
+    @property
+    def key(self):
+        """Canonical name, e.g. "garlic" for "2 cloves Garlic, minced"."""
+        return self.parsed.key
+
+
+@dataclass(slots=True)
+class Recipe:
+    """A cocktail, meal or custom recipe, whichever source it came from.
+
+    API records and custom recipes are converted once, when they enter the
+    app, and stored in this form. complete is False for filter.php results,
+    which carry only a name and a thumbnail.
+    """
+
+    kind: str
+    id: str = ""
+    name: str = ""
+    category: str = ""
+    area: str = ""
+    alcoholic: str = ""
+    instructions: str = ""
+    thumb: str = ""
+    image_path: str = ""
+    ingredients: tuple = ()
+    complete: bool = True
+
+    @classmethod
+    def from_api(cls, kind, data):
+        """Convert a TheCocktailDB or TheMealDB record."""
+        id_field, name_field, thumb_field, slots = API_FIELDS[kind]
+        ingredients = []
+        for i in range(1, slots + 1):
+            name = (data.get(f"strIngredient{i}") or "").strip()
+            if name:
+                ingredients.append(Ingredient(name, (data.get(f"strMeasure{i}") or "").strip()))
+        return cls(
+            kind=kind,
+            id=str(data.get(id_field) or ""),
+            name=(data.get(name_field) or "").strip(),
+            category=data.get('strCategory') or "",
+            area=data.get('strArea') or "",
+            alcoholic=data.get('strAlcoholic') or "",
+            instructions=(data.get('strInstructions') or "").strip(),
+            thumb=data.get(thumb_field) or "",
+            ingredients=tuple(ingredients),
+            complete='strInstructions' in data,
+        )
+
+    @classmethod
+    def from_dict(cls, kind, data):
+        """Load a stored recipe, converting API records and custom recipes
+        saved before this format existed."""
+        if data.get('format') == FORMAT:
+            return cls(
+                kind=kind,
+                id=data.get('id', ""),
+                name=data.get('name', ""),
+                category=data.get('category', ""),
+                area=data.get('area', ""),
+                alcoholic=data.get('alcoholic', ""),
+                instructions=data.get('instructions', ""),
+                thumb=data.get('thumb', ""),
+                image_path=data.get('image_path', ""),
+                ingredients=tuple(Ingredient(*ing) for ing in data.get('ingredients', ())),
+                complete=data.get('complete', True),
+            )
+        if kind in API_FIELDS:
+            return cls.from_api(kind, data)
+        return cls(
+            kind=kind,
+            id=data.get('id') or "",
+            name=data.get('name') or "",
+            category=data.get('category') or "",
+            instructions=data.get('instructions') or "",
+            image_path=data.get('image_path') or "",
+            ingredients=tuple(Ingredient(line.strip()) for line in data.get('ingredients', ()) if line.strip()),
+        )
+
+    def to_dict(self):
+        return {
+            'format': FORMAT,
+            'id': self.id,
+            'name': self.name,
+            'category': self.category,
+            'area': self.area,
+            'alcoholic': self.alcoholic,
+            'instructions': self.instructions,
+            'thumb': self.thumb,
+            'image_path': self.image_path,
+            'ingredients': [[ing.name, ing.measure] for ing in self.ingredients],
+            'complete': self.complete,
+        }
+
+    @property
+    def title(self):
+        return self.name or "Unknown"
+
+    def to_text(self):
+        """Plain text for exporting."""
+        lines = [f"Title: {self.title}", f"Category: {self.category or 'Unknown'}", "", "Ingredients:"]
+        lines.extend(f"- {ing}" for ing in self.ingredients)
+        lines.extend(["", "Instructions:", self.instructions, ""])
+        return "\n".join(lines)
@@ -0,0 +1,160 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+from bistro import profiling
+
+# Seconds to wait for a connection and then for each read
+TIMEOUT = (5, 15)
+MAX_PER_HOST = 6
+MAX_HOSTS = 8
+RETRIES = 3
+BACKOFF = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+CHUNK_SIZE = 16 * 1024
+USER_AGENT = "Bistro/1.0 (+https://github.com/cadmium-cmyk/Bistro)"
+
+
+class Cancelled(Exception):
+    """Raised when a request is abandoned because its cancel event was set."""
+
+
+class LatencyStats:
+    """Per-host request latency, kept for the most recent requests."""
+
+    WINDOW = 200
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}  # host -> deque of seconds
+        self.counts = {}  # host -> (requests, failures)
+
+    def record(self, url, seconds, ok):
+        host = urlsplit(url).netloc
+        with self.lock:
+            self.samples.setdefault(host, deque(maxlen=self.WINDOW)).append(seconds)
+            requests_made, failures = self.counts.get(host, (0, 0))
+            self.counts[host] = (requests_made + 1, failures + (0 if ok else 1))
+
+    def summary(self):
+        """Return {host: {count, failures, mean, p50, p95, max}} with times in ms."""
+        result = {}
+        with self.lock:
+            for host, samples in self.samples.items():
+                ordered = sorted(samples)
+                n = len(ordered)
+                count, failures = self.counts[host]
+                result[host] = {
+                    "count": count,
+                    "failures": failures,
+                    "mean": 1000 * sum(ordered) / n,
+                    "p50": 1000 * ordered[n // 2],
+                    "p95": 1000 * ordered[min(n - 1, int(n * 0.95))],
+                    "max": 1000 * ordered[-1],
+                }
+        return result
+
+
+stats = LatencyStats()
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Return the application-wide pooled requests.Session."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            # requests is imported on the first request, off the startup path
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+
+            retry = Retry(
+                total=RETRIES,
+                backoff_factor=BACKOFF,
+                status_forcelist=RETRY_STATUSES,
+                allowed_methods=frozenset(["GET", "HEAD"]),
+                respect_retry_after_header=True,
+            )
+            # Connections past MAX_PER_HOST are opened and then dropped rather
+            # than waited for, so a leaked response can't hang a host
+            adapter = HTTPAdapter(pool_connections=MAX_HOSTS, pool_maxsize=MAX_PER_HOST, max_retries=retry)
+            session = requests.Session()
+            session.headers["User-Agent"] = USER_AGENT
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def get(url, cancel=None, **kwargs):
+    """GET url through the shared session, raising for HTTP error statuses.
+
+    cancel is an optional threading.Event; if it is already set the request
+    is not sent.
+    """
+    if cancel is not None and cancel.is_set():
+        raise Cancelled(url)
+    kwargs.setdefault("timeout", TIMEOUT)
+    start = time.monotonic()
+    ok = False
+    try:
+        r = get_session().get(url, **kwargs)
+        try:
+            r.raise_for_status()
+        except Exception:
+            # A streamed body is never read, so give the connection back
+            r.close()
+            raise
+        if not kwargs.get("stream"):
+            profiling.count("bytes downloaded", len(r.content))
+        ok = True
+        return r
+    finally:
+        stats.record(url, time.monotonic() - start, ok)
+
+
+def get_bytes(url, cancel=None):
+    """Return the body of url, giving up between chunks once cancel is set."""
+    if cancel is None:
+        return get(url).content
+    with get(url, cancel=cancel, stream=True) as r:
+        chunks = []
+        for chunk in r.iter_content(CHUNK_SIZE):
+            if cancel.is_set():
+                raise Cancelled(url)
+            chunks.append(chunk)
+    data = b"".join(chunks)
+    profiling.count("bytes downloaded", len(data))
+    return data
+
+
+def download(url, path, cancel=None):
+    """Stream the body of url into the file at path.
+
+    Gives up between chunks once cancel is set; the partial file is removed
+    if the download fails.
+    """
+    size = 0
+    try:
+        with get(url, cancel=cancel, stream=True) as r, open(path, "wb") as f:
+            for chunk in r.iter_content(CHUNK_SIZE):
+                if cancel is not None and cancel.is_set():
+                    raise Cancelled(url)
+                f.write(chunk)
+                size += len(chunk)
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    finally:
+        profiling.count("bytes downloaded", size)
+
+
+def get_json(url, cancel=None):
+    return json.loads(get_bytes(url, cancel))
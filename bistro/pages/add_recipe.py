@@ -1,7 +1,5 @@
+import importlib.util
 import os
-import json
-import threading
-import requests
 import shutil
 import uuid
 import gi
@@ -9,17 +7,18 @@ gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
 from gi.repository import Gtk, Adw, Gio, GLib
 
-try:
-    from recipe_scrapers import scrape_me
-except ImportError:
-    scrape_me = None
+from bistro import aio, net
+from bistro.ingredients import parse_ingredient
+from bistro.model import Ingredient, Recipe
 
-class AddRecipePage(Adw.NavigationPage):
-    MY_RECIPES_FILE = os.path.join(GLib.get_user_data_dir(), "bistro", "my_recipes.json")
+# recipe_scrapers is slow to import, so only check that it is installed
+HAVE_SCRAPERS = importlib.util.find_spec("recipe_scrapers") is not None
 
-    def __init__(self, on_save_callback=None):
+class AddRecipePage(Adw.NavigationPage):
+    def __init__(self, repository):
         super().__init__(title="New Recipe", tag="add_recipe")
-        self.on_save_callback = on_save_callback
+        self.repository = repository
+        self.tasks = aio.TaskScope(self)
         
         # Toolbar View
         toolbar_view = Adw.ToolbarView()
@@ -46,7 +45,7 @@ class AddRecipePage(Adw.NavigationPage):
         scroll.set_child(box)
 
         # Import Section
-        if scrape_me:
+        if HAVE_SCRAPERS:
             import_group = Adw.PreferencesGroup(title="Import from URL")
             box.append(import_group)
             
@@ -147,41 +146,62 @@ class AddRecipePage(Adw.NavigationPage):
             
         btn.set_sensitive(False)
         self.spinner.start()
-        threading.Thread(target=self.do_scrape, args=(url, btn), daemon=True).start()
+        self.tasks.spawn(self.do_scrape(url, btn))
 
-    def do_scrape(self, url, btn):
+    async def do_scrape(self, url, btn):
         try:
-            scraper = scrape_me(url)
-            title = scraper.title()
-            ingredients = scraper.ingredients()
-            instructions = scraper.instructions()
-            image_url = scraper.image()
-            
-            # Download image if available
-            img_path = None
-            if image_url:
-                try:
-                    r = requests.get(image_url, stream=True)
-                    if r.status_code == 200:
-                        dest_dir = os.path.join(GLib.get_user_data_dir(), "bistro", "user_images")
-                        if not os.path.exists(dest_dir):
-                            os.makedirs(dest_dir)
-                        ext = os.path.splitext(image_url)[1] or ".jpg"
-                        # Clean extension
-                        if '?' in ext: ext = ext.split('?')[0]
-                        if not ext: ext = ".jpg"
-                        
-                        img_path = os.path.join(dest_dir, f"{uuid.uuid4()}{ext}")
-                        with open(img_path, 'wb') as f:
-                            r.raw.decode_content = True
-                            shutil.copyfileobj(r.raw, f)
-                except Exception as e:
-                    print(f"Image download failed: {e}")
-
-            GLib.idle_add(self.populate_form, title, ingredients, instructions, img_path, btn)
+            result = await aio.run_io(self.scrape, url)
         except Exception as e:
             print(f"Scrape failed: {e}")
-            GLib.idle_add(self.show_scrape_error, str(e), btn)
+            self.show_scrape_error(str(e), btn)
+            return
+        self.populate_form(*result, btn)
+
+    def scrape(self, url, cancel=None):
+        # Runs on the I/O pool, which is also where recipe_scrapers and its
+        # parsers get imported, the first time a URL is imported
+        import recipe_scrapers
+        if hasattr(recipe_scrapers, "scrape_html"):
+            # Fetch through the shared session so timeouts and retries apply
+            scraper = recipe_scrapers.scrape_html(net.get(url, cancel=cancel).text, org_url=url)
+        else:
+            scraper = recipe_scrapers.scrape_me(url)
+        title = scraper.title()
+        ingredients = self.clean_ingredients(scraper.ingredients())
+        instructions = scraper.instructions()
+        image_url = scraper.image()
+            
+        # Download image if available
+        img_path = None
+        if image_url:
+            try:
+                dest_dir = os.path.join(GLib.get_user_data_dir(), "bistro", "user_images")
+                if not os.path.exists(dest_dir):
+                    os.makedirs(dest_dir)
+                ext = os.path.splitext(image_url)[1] or ".jpg"
+                # Clean extension
+                if '?' in ext: ext = ext.split('?')[0]
+                if not ext: ext = ".jpg"
+
+                path = os.path.join(dest_dir, f"{uuid.uuid4()}{ext}")
+                net.download(image_url, path, cancel=cancel)
+                img_path = path
+            except Exception as e:
+                print(f"Image download failed: {e}")
+
+        return title, ingredients, instructions, img_path
+
+    def clean_ingredients(self, lines):
+        # Runs on the I/O pool. Pages often list an ingredient twice; parsing
+        # here also means the lines are cached by the time they're saved.
+        seen = set()
+        result = []
+        for line in lines:
+            line = " ".join(line.split())
+            if line and (parsed := parse_ingredient(line)) not in seen:
+                seen.add(parsed)
+                result.append(line)
+        return result
 
     def populate_form(self, title, ingredients, instructions, img_path, btn):
         self.spinner.stop()
@@ -238,36 +258,17 @@ class AddRecipePage(Adw.NavigationPage):
         # self.get_root() works if the page is attached.
         dialog.open(self.get_root(), None, open_callback)
 
-    def load_json(self, filename):
-        if os.path.exists(filename):
-            try:
-                with open(filename, 'r') as f:
-                    return json.load(f)
-            except:
-                pass
-        return []
-
-    def save_json(self, filename, data):
-        try:
-            with open(filename, 'w') as f:
-                json.dump(data, f, indent=4)
-        except:
-            pass
-
     def on_save(self, btn):
         name = self.name_entry.get_text().strip()
         if not name:
             self.toast_overlay.add_toast(Adw.Toast.new("Name is required"))
             return
         
-        ings = [r.get_text().strip() for r in self.ingredient_rows if r.get_text().strip()]
+        ings = tuple(Ingredient(r.get_text().strip()) for r in self.ingredient_rows if r.get_text().strip())
         start, end = self.inst_buffer.get_bounds()
         instructions = self.inst_buffer.get_text(start, end, True).strip()
         
-        # Load existing
-        recipes = self.load_json(self.MY_RECIPES_FILE)
-        
-        saved_img_path = None
+        saved_img_path = ""
         if self.selected_image_path and os.path.exists(self.selected_image_path):
             # Copy to user_images
             try:
@@ -275,8 +276,6 @@ class AddRecipePage(Adw.NavigationPage):
                 if not os.path.exists(dest_dir):
                     os.makedirs(dest_dir)
                 ext = os.path.splitext(self.selected_image_path)[1]
-                import shutil
-                import uuid
                 new_filename = f"{uuid.uuid4()}{ext}"
                 dest_path = os.path.join(dest_dir, new_filename)
                 shutil.copy(self.selected_image_path, dest_path)
@@ -284,18 +283,15 @@ class AddRecipePage(Adw.NavigationPage):
             except Exception as e:
                 print(f"Failed to copy image: {e}")
 
-        new_recipe = {
-            "name": name, 
-            "category": self.cat_entry.get_text().strip(),
-            "ingredients": ings, 
-            "instructions": instructions,
-            "image_path": saved_img_path
-        }
-        recipes.append(new_recipe)
-        self.save_json(self.MY_RECIPES_FILE, recipes)
-        
-        if self.on_save_callback:
-            self.on_save_callback()
+        new_recipe = Recipe(
+            kind="custom",
+            name=name,
+            category=self.cat_entry.get_text().strip(),
+            ingredients=ings,
+            instructions=instructions,
+            image_path=saved_img_path,
+        )
+        self.repository.save_recipe(new_recipe)
             
         # Pop self
         # We need to find the navigation view. 
@@ -1,24 +1,29 @@
-import json
 import os
-import threading
-import requests
 import gi
 
 gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
-gi.require_version('GdkPixbuf', '2.0')
-from gi.repository import Gtk, Adw, GLib, Gdk, GdkPixbuf
+from gi.repository import Gtk, Adw, Gio
 
-class CocktailPage(Adw.Bin):
-    FAV_FILE = os.path.join(GLib.get_user_data_dir(), "bistro", "cocktails.json")
-    MY_RECIPES_FILE = os.path.join(GLib.get_user_data_dir(), "bistro", "my_recipes.json")
+from bistro import aio, net, profiling
+from bistro.cache import ResponseCache
+from bistro.catalog import Catalog
+from bistro.image_loader import ImageLoader
+from bistro.model import Recipe
+from bistro.search import Prefetcher, SearchController, SearchResult
+from bistro.search_index import SearchIndex
 
-    def __init__(self, shopping_list_page=None):
+class CocktailPage(Adw.Bin):
+    def __init__(self, repository):
         super().__init__()
-        self.shopping_list_page = shopping_list_page
-        self.ensure_data_dir()
-        self.favorites = self.load_favorites_from_disk()
+        self.repository = repository
+        self.repository.connect("favorite-changed", self.on_favorite_changed)
+        self.fav_buttons = {}  # id -> star button of the bound rows
         self.last_query = None
+        self.last_search = None
+        self.search = SearchController(self.do_fetch, self.update_ui, self)
+        self.tasks = aio.TaskScope(self)
+        self.prefetcher = Prefetcher(self)
         
         self.toast_overlay = Adw.ToastOverlay()
         self.set_child(self.toast_overlay)
@@ -73,43 +78,25 @@ class CocktailPage(Adw.Bin):
         self.status_page.set_vexpand(True)
         main_box.append(self.status_page)
         
-        self.results_list = Gtk.ListBox()
-        self.results_list.add_css_class("boxed-list")
-        self.results_list.set_selection_mode(Gtk.SelectionMode.NONE)
-        self.results_list.set_margin_top(12)
-        self.results_list.set_margin_bottom(24)
-        self.results_list.set_margin_start(24)
-        self.results_list.set_margin_end(24)
-        
-        clamp = Adw.Clamp()
-        clamp.set_child(self.results_list)
-        self.scroll.set_child(clamp)
-
-    def load_favorites_from_disk(self):
-        if os.path.exists(self.FAV_FILE):
-            try:
-                with open(self.FAV_FILE, 'r') as f:
-                    return json.load(f)
-            except:
-                pass
-        
-        try:
-            base = os.path.dirname(os.path.abspath(__file__))
-            default_file = os.path.join(base, "..", "..", "cocktails.json")
-            if os.path.exists(default_file):
-                with open(default_file, 'r') as f:
-                    return json.load(f)
-        except:
-            pass
-            
-        return {}
-
-    def save_favorites_to_disk(self):
-        try:
-            with open(self.FAV_FILE, 'w') as f:
-                json.dump(self.favorites, f, indent=4)
-        except:
-            pass
+        # Shown in place of the results when a search finds nothing
+        self.empty_label = Gtk.Label(margin_top=40, css_classes=["dim-label"], vexpand=True, valign=Gtk.Align.START)
+        self.empty_label.set_visible(False)
+        main_box.append(self.empty_label)
+
+        # Results are a list model; the list view recycles a screenful of rows
+        self.results = Gio.ListStore.new(SearchResult)
+        factory = Gtk.SignalListItemFactory()
+        factory.connect("setup", self.on_setup_row)
+        factory.connect("bind", self.on_bind_row)
+        factory.connect("unbind", self.on_unbind_row)
+
+        self.results_view = Gtk.ListView(model=Gtk.NoSelection(model=self.results), factory=factory)
+        self.results_view.add_css_class("background")
+        self.results_view.set_margin_top(12)
+        self.results_view.set_margin_bottom(24)
+        self.results_view.set_margin_start(24)
+        self.results_view.set_margin_end(24)
+        self.scroll.set_child(Adw.ClampScrollable(child=self.results_view))
 
     def on_random(self, btn):
         self.clear_list()
@@ -118,16 +105,27 @@ class CocktailPage(Adw.Bin):
         self.scroll.set_visible(False)
         # Reset last_query so pending searches are ignored if they return
         self.last_query = None
-        threading.Thread(target=self.do_fetch, args=("https://www.thecocktaildb.com/api/json/v1/1/random.php", True, None, None), daemon=True).start()
+        self.last_search = None
+        task = self.search.submit(None, "https://www.thecocktaildb.com/api/json/v1/1/random.php", None, immediate=True)
+        # Also when a newer search cancels it
+        task.add_done_callback(lambda task: btn.set_sensitive(True))
 
     def on_search(self, entry):
         q = entry.get_text().strip()
+        url = self.search_url(q)
+
+        # Same search as the one pending or on screen, e.g. a trailing space
+        if q and (q, url) == self.last_search:
+            return
+        self.last_search = (q, url)
         self.clear_list()
         
         # Update last_query
         self.last_query = q
         
         if not q:
+            self.search.cancel()
+            self.spinner.stop()
             self.scroll.set_visible(False)
             self.status_page.set_visible(True)
             return
@@ -136,64 +134,45 @@ class CocktailPage(Adw.Bin):
         self.spinner.start()
         self.scroll.set_visible(False)
         
+        self.search.submit(q, url, self.search_type.get_selected_item().get_string())
+
+    def search_url(self, query):
         selected = self.search_type.get_selected_item().get_string()
         if selected == "Ingredient":
-            url = f"https://www.thecocktaildb.com/api/json/v1/1/filter.php?i={q}"
+            return f"https://www.thecocktaildb.com/api/json/v1/1/filter.php?i={query}"
         else:
-            url = f"https://www.thecocktaildb.com/api/json/v1/1/search.php?s={q}"
-
-        # Create a copy of favorites to pass to the thread for safety
-        favorites_copy = self.favorites.copy()
-        threading.Thread(target=self.do_fetch, args=(url, False, q, favorites_copy), daemon=True).start()
-
-    def load_my_recipes(self):
-        if os.path.exists(self.MY_RECIPES_FILE):
-            try:
-                with open(self.MY_RECIPES_FILE, 'r') as f:
-                    return json.load(f)
-            except:
-                pass
-        return []
-
-    def do_fetch(self, url, is_random, query_used, favorites_snapshot=None):
+            return f"https://www.thecocktaildb.com/api/json/v1/1/search.php?s={query}"
+
+    def lookup_url(self, item_id):
+        return f"https://www.thecocktaildb.com/api/json/v1/1/lookup.php?i={item_id}"
+
+    @profiling.traced()
+    def do_fetch(self, url, query_used, mode=None, cancel=None):
         results = []
         seen_ids = set()
 
         # 1. Local Search (only if not random)
-        if not is_random and query_used and favorites_snapshot is not None:
-            q_lower = query_used.lower()
-            
-            # Search Favorites (Cocktails)
-            for d_id, data in favorites_snapshot.items():
-                name = data.get('strDrink', '').lower()
-                if q_lower in name:
-                    # Mark as local/favorite
-                    results.append(data)
-                    seen_ids.add(d_id)
-            
-            # Search My Recipes (Custom)
-            custom_recipes = self.load_my_recipes()
-            for r in custom_recipes:
-                name = r.get('name', '').lower()
-                if q_lower in name:
-                    results.append(r)
+        if query_used:
+            # Saved favorites and custom recipes, from the full-text index
+            for kind, key, recipe in SearchIndex.get_default().search(query_used, kinds=("cocktail", "custom")):
+                results.append(recipe)
+                if kind == "cocktail":
+                    seen_ids.add(key)
         
-        # 2. API Fetch
+        # 2. API Fetch, answered from the offline catalog when it is enabled and synced
         try:
-            r = requests.get(url)
-            api_data = r.json().get('drinks')
-            if api_data:
-                for d in api_data:
-                    d_id = d.get('idDrink')
-                    if d_id not in seen_ids:
-                        results.append(d)
+            catalog = Catalog.get_default()
+            if catalog.is_ready("cocktail"):
+                api_data = catalog.search("cocktail", mode, query_used) if query_used else catalog.random("cocktail")
+            else:
+                api_data = [Recipe.from_api("cocktail", r) for r in ResponseCache.get_default().get_json(url, cancel=cancel).get('drinks') or ()]
+            results.extend(r for r in api_data if r.id not in seen_ids)
+        except net.Cancelled:
+            raise
         except:
             pass
         
-        if is_random:
-            GLib.idle_add(self.rand_btn.set_sensitive, True)
-        
-        GLib.idle_add(self.update_ui, results, query_used)
+        return results
 
     def update_ui(self, drinks, query_used):
         self.spinner.stop()
@@ -207,42 +186,83 @@ class CocktailPage(Adw.Bin):
         if not drinks:
             self.show_status("No drinks found.")
         else:
-            for d in drinks:
-                self.results_list.append(self.create_row(d))
+            # Rows are only built for the results scrolled into view
+            self.results.splice(0, self.results.get_n_items(), [SearchResult(d) for d in drinks])
+
+            # filter.php results lack instructions; look up the first few ahead of time
+            self.prefetcher.prefetch([self.lookup_url(r.id) for r in drinks if not r.complete])
         return False
 
-    def ensure_data_dir(self):
-        d = os.path.dirname(self.FAV_FILE)
-        if not os.path.exists(d):
-            os.makedirs(d)
+    def on_setup_row(self, factory, list_item):
+        list_item.set_activatable(False)
 
-    def create_row(self, data):
-        # Handle different data structures
-        title_text = data.get('strDrink') or data.get('name') or "Unknown"
-        category = data.get('strCategory') or data.get('category') or "Unknown"
-        
-        row = Adw.ExpanderRow(title=title_text)
+        row = Adw.ExpanderRow()
         row.set_use_markup(False)
-        row.set_subtitle(category)
-        
-        d_id = data.get('idDrink')
-        if d_id:
-            is_fav = d_id in self.favorites
-            fav = Gtk.Button(icon_name="starred-symbolic" if is_fav else "non-starred-symbolic", valign=Gtk.Align.CENTER)
-            fav.add_css_class("flat")
-            fav.connect("clicked", self.toggle_fav, d_id, data)
-            row.add_suffix(fav)
-        else:
-            # Custom recipe?
-            pass
+        row.item = None
+
+        row.fav = Gtk.Button(valign=Gtk.Align.CENTER)
+        row.fav.add_css_class("flat")
+        row.fav.connect("clicked", self.toggle_fav, row)
+        row.add_suffix(row.fav)
+
+        # Picture, instructions and ingredients are built when the row is expanded
+        row.details = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=12)
+        row.details.set_margin_top(12)
+        row.details.set_margin_bottom(12)
+        row.details.set_margin_start(12)
+        row.details.set_margin_end(12)
+        row.add_row(row.details)
+        row.connect("notify::expanded", self.on_row_expanded)
+
+        frame = Gtk.ListBox(css_classes=["boxed-list"], margin_bottom=6)
+        frame.set_selection_mode(Gtk.SelectionMode.NONE)
+        frame.append(row)
+        frame.row = row
+        list_item.set_child(frame)
+
+    def on_bind_row(self, factory, list_item):
+        item = list_item.get_item()
+        row = list_item.get_child().row
+        recipe = item.recipe
+
+        row.set_title(recipe.title)
+        row.set_subtitle(recipe.category or "Unknown")
+
+        # Custom recipes from the index can't be starred
+        row.fav.set_visible(recipe.kind == "cocktail")
+        if recipe.kind == "cocktail":
+            is_fav = self.repository.is_favorite("cocktail", recipe.id)
+            row.fav.set_icon_name("starred-symbolic" if is_fav else "non-starred-symbolic")
+            self.fav_buttons[recipe.id] = row.fav
+
+        row.item = item
+        row.set_expanded(item.expanded)
+
+    def on_unbind_row(self, factory, list_item):
+        row = list_item.get_child().row
+        item, row.item = row.item, None
+        if item and self.fav_buttons.get(item.recipe.id) is row.fav:
+            del self.fav_buttons[item.recipe.id]
+        row.set_expanded(False)
+
+        loader = ImageLoader.get_default()
+        while c := row.details.get_first_child():
+            if isinstance(c, Gtk.Picture):
+                loader.forget(c)
+            row.details.remove(c)
+
+    def on_row_expanded(self, row, param):
+        item = row.item
+        if item is None:
+            return
+        item.expanded = row.get_expanded()
+        if item.expanded and not row.details.get_first_child():
+            self.populate_row(row, item)
+
+    def populate_row(self, row, item):
+        box = row.details
+        recipe = item.recipe
 
-        box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=12)
-        box.set_margin_top(12)
-        box.set_margin_bottom(12)
-        box.set_margin_start(12)
-        box.set_margin_end(12)
-        
-        # Add image here
         img = Gtk.Picture()
         img.set_size_request(150, 150)
         img.set_content_fit(Gtk.ContentFit.COVER)
@@ -251,132 +271,108 @@ class CocktailPage(Adw.Bin):
         img.add_css_class("rounded-image")
         box.append(img)
         
-        thumb = data.get('strDrinkThumb')
-        if thumb:
-            threading.Thread(target=self.load_image, args=(f"{thumb}/preview", img), daemon=True).start()
-        elif img_path := data.get('image_path'):
-             if os.path.exists(img_path):
-                 img.set_filename(img_path)
-
-        # Check completeness
-        is_full = 'strInstructions' in data or 'instructions' in data or ('ingredients' in data and isinstance(data['ingredients'], list))
-        
-        if is_full:
-            self.populate_details_box(box, data)
+        if recipe.thumb:
+            ImageLoader.get_default().load(f"{recipe.thumb}/preview", img, self)
+        elif recipe.image_path and os.path.exists(recipe.image_path):
+            img.set_filename(recipe.image_path)
+
+        if recipe.complete:
+            self.populate_details_box(box, recipe)
+        elif item.details:
+            self.populate_details_box(box, item.details)
         else:
             # Lazy loading
             spinner = Gtk.Spinner()
             spinner.set_margin_top(12)
             spinner.set_margin_bottom(12)
             box.append(spinner)
-            row.connect("notify::expanded", self.on_row_expanded, data['idDrink'], box, spinner)
-
-        row.add_row(box)
-        return row
-
-    def on_row_expanded(self, row, param, drink_id, box, spinner):
-        if row.get_expanded() and not getattr(row, "loaded", False):
-            row.loaded = True
             spinner.start()
-            threading.Thread(target=self.fetch_details, args=(drink_id, box, spinner), daemon=True).start()
+            self.tasks.spawn(self.fetch_details(row, item, spinner))
 
-    def fetch_details(self, drink_id, box, spinner):
+    @profiling.traced()
+    async def fetch_details(self, row, item, spinner):
+        details = None
         try:
-            r = requests.get(f"https://www.thecocktaildb.com/api/json/v1/1/lookup.php?i={drink_id}")
-            data = r.json()
+            data = await aio.run_io(ResponseCache.get_default().get_json, self.lookup_url(item.recipe.id))
             if data and data.get('drinks'):
-                details = data['drinks'][0]
-                GLib.idle_add(self.update_row_details, box, spinner, details)
-                return
+                details = item.details = Recipe.from_api("cocktail", data['drinks'][0])
         except Exception as e:
             print(f"Fetch details failed: {e}")
-        
-        GLib.idle_add(self.update_row_details, box, spinner, None)
 
-    def update_row_details(self, box, spinner, data):
+        # The row may have been recycled for another result meanwhile
+        if row.item is item and spinner.get_parent() is row.details:
+            self.update_row_details(row.details, spinner, details)
+
+    def update_row_details(self, box, spinner, recipe):
         spinner.stop()
         box.remove(spinner)
         
-        if data:
-            self.populate_details_box(box, data)
+        if recipe:
+            self.populate_details_box(box, recipe)
         else:
             box.append(Gtk.Label(label="Failed to load details.", css_classes=["error"]))
         return False
 
-    def populate_details_box(self, box, data):
-        instr = data.get('strInstructions') or data.get('instructions') or ''
-        if instr:
-            box.append(Gtk.Label(label=instr, wrap=True, xalign=0))
-        
-        ings = []
-        # Try custom ingredients list first
-        if 'ingredients' in data and isinstance(data['ingredients'], list):
-             for x in data['ingredients']:
-                 ings.append(f"• {x}")
-        else:
-            for i in range(1, 16):
-                if ing := data.get(f"strIngredient{i}"):
-                    meas = (data.get(f"strMeasure{i}") or "").strip()
-                    ings.append(f"• {meas} {ing.strip()}")
-        
-        if ings:
+    def populate_details_box(self, box, recipe):
+        if recipe.instructions:
+            box.append(Gtk.Label(label=recipe.instructions, wrap=True, xalign=0))
+
+        if recipe.ingredients:
             ing_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=6)
             box.append(ing_box)
-            
-            for ing_str in ings:
-                 text = ing_str.lstrip("• ").strip()
-                 
+
+            for ing in recipe.ingredients:
+                 text = str(ing)
+
                  row_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=12)
                  lbl = Gtk.Label(label=f"• {text}", xalign=0, hexpand=True, css_classes=["dim-label"])
                  btn = Gtk.Button(icon_name="list-add-symbolic")
                  btn.add_css_class("flat")
                  btn.set_tooltip_text("Add to Shopping List")
-                 if self.shopping_list_page:
-                    btn.connect("clicked", self.on_add_to_list, text)
-                 else:
-                    btn.set_sensitive(False)
+                 btn.connect("clicked", self.on_add_to_list, ing)
                  
                  row_box.append(lbl)
                  row_box.append(btn)
                  ing_box.append(row_box)
 
-    def on_add_to_list(self, btn, text):
-        if self.shopping_list_page.add_item(text):
-            self.toast_overlay.add_toast(Adw.Toast.new(f"Added '{text}' to list"))
-        else:
-            self.toast_overlay.add_toast(Adw.Toast.new(f"'{text}' is already in list"))
-
-    def toggle_fav(self, btn, d_id, data):
-        if d_id in self.favorites:
-            del self.favorites[d_id]
-            btn.set_icon_name("non-starred-symbolic")
+            add_all = Gtk.Button(label="Add All to Shopping List", halign=Gtk.Align.START)
+            add_all.add_css_class("flat")
+            add_all.connect("clicked", self.on_add_all_to_list, recipe)
+            ing_box.append(add_all)
+
+    def on_add_to_list(self, btn, ing):
+        # Amounts of an ingredient already on the list are added up
+        text = str(ing)
+        entry = self.repository.add_shopping_item(ing)
+        self.toast_overlay.add_toast(Adw.Toast.new(f"Added '{text}' to list" if entry == text else f"Shopping list: {entry}"))
+
+    def on_add_all_to_list(self, btn, recipe):
+        self.repository.add_shopping_items(recipe.ingredients)
+        self.toast_overlay.add_toast(Adw.Toast.new(f"Added {len(recipe.ingredients)} ingredients to list"))
+
+    def toggle_fav(self, btn, row):
+        item = row.item
+        recipe = item.recipe
+        if self.repository.remove_favorite("cocktail", recipe.id):
             self.toast_overlay.add_toast(Adw.Toast.new("Removed"))
         else:
-            self.favorites[d_id] = data
-            btn.set_icon_name("starred-symbolic")
+            # Save the looked-up record rather than a partial filter.php result
+            self.repository.save_favorite("cocktail", recipe.id, item.details or recipe)
             self.toast_overlay.add_toast(Adw.Toast.new("Saved"))
-        self.save_favorites_to_disk()
 
-    def load_image(self, url, widget):
-        try:
-            r = requests.get(url)
-            GLib.idle_add(self.set_image_texture, widget, r.content)
-        except:
-            pass
-
-    def set_image_texture(self, widget, data):
-        try:
-            loader = GdkPixbuf.PixbufLoader()
-            loader.write(data)
-            loader.close()
-            widget.set_paintable(Gdk.Texture.new_for_pixbuf(loader.get_pixbuf()))
-        except:
-            pass
-        return False
+    def on_favorite_changed(self, repository, kind, item_id, saved):
+        # Keep the star in sync when the favorite is changed elsewhere, e.g. the Collection
+        if kind == "cocktail" and (btn := self.fav_buttons.get(item_id)):
+            btn.set_icon_name("starred-symbolic" if saved else "non-starred-symbolic")
 
     def show_status(self, msg):
-        self.results_list.append(Gtk.Label(label=msg, margin_top=40, css_classes=["dim-label"]))
+        self.scroll.set_visible(False)
+        self.empty_label.set_label(msg)
+        self.empty_label.set_visible(True)
 
     def clear_list(self): 
-        while c := self.results_list.get_first_child():
-            self.results_list.remove(c)
+        ImageLoader.get_default().cancel(self)
+        self.tasks.cancel()
+        self.prefetcher.cancel()
+        self.empty_label.set_visible(False)
+        self.results.remove_all()
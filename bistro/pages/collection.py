@@ -1,46 +1,64 @@
-import json
 import os
-import threading
-import requests
 import gi
 
 gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
-gi.require_version('GdkPixbuf', '2.0')
-from gi.repository import Gtk, Adw, GdkPixbuf, Gdk, GLib, Gio
+from gi.repository import Gtk, Adw, Gio, GObject
 
+from bistro import aio, profiling
+from bistro.image_loader import ImageLoader
+from bistro.search_index import SearchIndex
 from bistro.pages.add_recipe import AddRecipePage
 
-class CollectionPage(Adw.Bin):
-    MY_RECIPES_FILE = os.path.join(GLib.get_user_data_dir(), "bistro", "my_recipes.json")
-    COCKTAILS_FILE = os.path.join(GLib.get_user_data_dir(), "bistro", "cocktails.json")
-    MEALS_FILE = os.path.join(GLib.get_user_data_dir(), "bistro", "meals.json")
+# kind -> (section title, row icon, section order)
+SECTIONS = {
+    "custom": ("My Creations", "document-edit-symbolic", 0),
+    "cocktail": ("Saved Cocktails", "drinks-symbolic", 1),
+    "meal": ("Saved Recipes", "fast-food-symbolic", 2),
+}
+
+DELETED_MESSAGES = {
+    "custom": "Recipe deleted",
+    "cocktail": "Cocktail unsaved",
+    "meal": "Meal unsaved",
+}
+
+
+class CollectionItem(GObject.Object):
+    """A custom recipe or saved favorite in the Collection model.
 
-    def __init__(self, shopping_list_page=None):
+    Rows are recycled as they scroll, so whether a row was expanded lives
+    here, as on the search pages' SearchResult.
+    """
+
+    def __init__(self, kind, key, recipe):
         super().__init__()
-        
-        # Load resources locally to ensure icons are available
-        base_path = os.path.dirname(os.path.abspath(__file__))
-        resource_path = os.path.join(base_path, "..", "..", "bistro.gresource")
-        
-        if os.path.exists(resource_path):
-            try:
-                resource = Gio.Resource.load(resource_path)
-                try:
-                    resource._register()
-                except:
-                    pass
-            except Exception as e:
-                print(f"Collection: Failed to load resource: {e}")
+        self.kind = kind
+        self.key = key
+        self.recipe = recipe
+        self.expanded = False
+
+    @property
+    def title(self):
+        return self.recipe.title
+
+    @property
+    def subtitle(self):
+        return self.recipe.category or ("Custom" if self.kind == "custom" else "Unknown")
 
-        # Ensure icon theme path
-        icon_theme = Gtk.IconTheme.get_for_display(Gdk.Display.get_default())
-        if not "/com/github/cadmiumcmyk/Bistro/icons" in icon_theme.get_resource_path():
-             icon_theme.add_resource_path("/com/github/cadmiumcmyk/Bistro/icons")
 
-        self.shopping_list_page = shopping_list_page
+class CollectionPage(Adw.Bin):
+    def __init__(self, repository):
+        super().__init__()
+        
+        self.repository = repository
+        self.repository.connect("favorite-changed", self.on_favorite_changed)
+        self.repository.connect("recipe-changed", self.on_recipe_changed)
         self.filter_text = ""
-        self.ensure_data_dir()
+        self.matches = None  # (kind, key) pairs matching matched_text, None when unfiltered
+        self.matched_text = ""
+        self.match_task = None
+        self.tasks = aio.TaskScope(self)
         
         self.toast_overlay = Adw.ToastOverlay()
         self.set_child(self.toast_overlay)
@@ -73,402 +91,287 @@ class CollectionPage(Adw.Bin):
         add_btn.connect("clicked", self.on_add_clicked)
         row_header.append(add_btn)
 
+        # Model: every item lives in the store; the filter hides the ones that
+        # don't match and the section sorter groups them under their headers.
+        # Changes touch single items, and the list view only builds rows for
+        # what is on screen.
+        self.items = {}  # (kind, key) -> CollectionItem
+        self.store = Gio.ListStore.new(CollectionItem)
+        self.load_items()
+
+        self.filter = Gtk.CustomFilter.new(self.match_item)
+        filtered = Gtk.FilterListModel(model=self.store, filter=self.filter)
+        sections = Gtk.SortListModel(model=filtered, section_sorter=Gtk.CustomSorter.new(self.compare_sections))
+        self.model = sections
+
+        factory = Gtk.SignalListItemFactory()
+        factory.connect("setup", self.on_setup_row)
+        factory.connect("bind", self.on_bind_row)
+        factory.connect("unbind", self.on_unbind_row)
+
+        header_factory = Gtk.SignalListItemFactory()
+        header_factory.connect("setup", self.on_setup_header)
+        header_factory.connect("bind", self.on_bind_header)
+
+        self.list_view = Gtk.ListView(model=Gtk.NoSelection(model=sections), factory=factory)
+        self.list_view.set_header_factory(header_factory)
+        self.list_view.add_css_class("background")
+        self.list_view.set_margin_top(12)
+        self.list_view.set_margin_bottom(24)
+        self.list_view.set_margin_start(24)
+        self.list_view.set_margin_end(24)
+
         # Scrollable Content
-        scroll = Gtk.ScrolledWindow()
-        scroll.set_vexpand(True)
-        main_box.append(scroll)
-        
-        self.scroll_content = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=24)
-        self.scroll_content.set_margin_top(12)
-        self.scroll_content.set_margin_bottom(24)
-        self.scroll_content.set_margin_start(24)
-        self.scroll_content.set_margin_end(24)
-        
-        clamp = Adw.Clamp()
-        clamp.set_child(self.scroll_content)
-        scroll.set_child(clamp)
+        self.scroll = Gtk.ScrolledWindow()
+        self.scroll.set_vexpand(True)
+        self.scroll.set_child(Adw.ClampScrollable(child=self.list_view))
+        main_box.append(self.scroll)
+
+        self.empty_label = Gtk.Label(css_classes=["dim-label"], vexpand=True, valign=Gtk.Align.START, margin_top=12)
+        main_box.append(self.empty_label)
+        self.update_empty_state()
+        sections.connect("items-changed", lambda *args: self.update_empty_state())
+
+    # Model
+
+    @profiling.traced("CollectionPage.load_items")
+    def load_items(self):
+        items = [CollectionItem("custom", r_id, r) for r_id, r in self.repository.recipes.items()]
+        for kind in ("cocktail", "meal"):
+            items.extend(CollectionItem(kind, key, recipe) for key, recipe in self.repository.favorites[kind].items())
+        for item in items:
+            self.items[(item.kind, item.key)] = item
+        self.store.splice(0, 0, items)
+
+    def put_item(self, kind, key, recipe):
+        item = CollectionItem(kind, key, recipe)
+        old = self.items.get((kind, key))
+        self.items[(kind, key)] = item
+        if old is None:
+            self.store.append(item)
+        else:
+            # An edited recipe stays open if it was
+            item.expanded = old.expanded
+            found, pos = self.store.find(old)
+            if found:
+                self.store.splice(pos, 1, [item])
+
+    def drop_item(self, kind, key):
+        if old := self.items.pop((kind, key), None):
+            found, pos = self.store.find(old)
+            if found:
+                self.store.remove(pos)
+
+    def on_favorite_changed(self, repository, kind, key, saved):
+        self.refresh_matches()
+        if saved:
+            self.put_item(kind, key, repository.favorites[kind][key])
+        else:
+            self.drop_item(kind, key)
 
-        self.refresh_all()
+    def on_recipe_changed(self, repository, r_id, present):
+        self.refresh_matches()
+        if present:
+            self.put_item("custom", r_id, repository.recipes[r_id])
+        else:
+            self.drop_item("custom", r_id)
 
-    def load_json(self, filename):
-        if os.path.exists(filename):
-            try:
-                with open(filename, 'r') as f:
-                    return json.load(f)
-            except:
-                pass
-        
-        # Try default file
-        basename = os.path.basename(filename)
-        # my_recipes.json doesn't have a default
-        if basename == "my_recipes.json":
-            return []
-            
-        try:
-            base = os.path.dirname(os.path.abspath(__file__))
-            default_file = os.path.join(base, "..", "..", basename)
-            if os.path.exists(default_file):
-                with open(default_file, 'r') as f:
-                    return json.load(f)
-        except:
-            pass
-            
-        return {}
-
-    def save_json(self, filename, data):
-        try:
-            with open(filename, 'w') as f:
-                json.dump(data, f, indent=4)
-        except:
-            pass
+    def compare_sections(self, a, b, *args):
+        x, y = SECTIONS[a.kind][2], SECTIONS[b.kind][2]
+        if x < y:
+            return Gtk.Ordering.SMALLER
+        if x > y:
+            return Gtk.Ordering.LARGER
+        return Gtk.Ordering.EQUAL
+
+    # Filtering
+
+    def match_item(self, item, *args):
+        return self.matches is None or (item.kind, item.key) in self.matches
 
     def on_filter_changed(self, entry):
+        old = self.filter_text
         self.filter_text = entry.get_text().strip().lower()
-        self.refresh_all()
+        if self.filter_text != old:
+            self.update_matches()
+
+    def refresh_matches(self):
+        # A changed item may now match, or stop matching, the active filter
+        if self.filter_text:
+            self.update_matches(refresh=True)
+
+    def update_matches(self, refresh=False):
+        if self.match_task:
+            self.match_task.cancel()
+            self.match_task = None
+        if self.filter_text:
+            # The index query waits on its writer, so it runs on the I/O pool
+            self.match_task = self.tasks.spawn(self.load_matches(self.filter_text, refresh), name="collection filter")
+        else:
+            self.apply_matches("", None, refresh)
+
+    async def load_matches(self, text, refresh):
+        matches = await aio.run_io(SearchIndex.get_default().search_keys, text)
+        self.match_task = None
+        self.apply_matches(text, matches, refresh)
+
+    def apply_matches(self, text, matches, refresh):
+        old, self.matched_text, self.matches = self.matched_text, text, matches
+        # Tokens are prefix matches, so typing more can only narrow the results
+        if refresh:
+            change = Gtk.FilterChange.DIFFERENT
+        elif old and text.startswith(old):
+            change = Gtk.FilterChange.MORE_STRICT
+        elif not text or old.startswith(text):
+            change = Gtk.FilterChange.LESS_STRICT
+        else:
+            change = Gtk.FilterChange.DIFFERENT
+        self.filter.changed(change)
 
-    def refresh_all(self):
-        # Clear content
-        while c := self.scroll_content.get_first_child():
-            self.scroll_content.remove(c)
-        
-        self.build_my_creations(self.filter_text)
-        self.build_cocktails(self.filter_text)
-        self.build_meals(self.filter_text)
-        
-        if not self.scroll_content.get_first_child():
-             msg = "No items found." if self.filter_text else "Collection is empty."
-             self.scroll_content.append(Gtk.Label(label=msg, css_classes=["dim-label"]))
+    def update_empty_state(self):
+        empty = self.model.get_n_items() == 0
+        self.empty_label.set_label("No items found." if self.filter_text else "Collection is empty.")
+        self.empty_label.set_visible(empty)
+        self.scroll.set_visible(not empty)
 
-    def build_my_creations(self, filter_text=""):
-        recipes = self.load_json(self.MY_RECIPES_FILE)
-        if not recipes:
-            return
+    # Rows
 
-        visible_count = 0
-        group = Adw.PreferencesGroup(title="My Creations")
-        
-        for i, r in enumerate(recipes):
-            if filter_text:
-                name = r.get('name', '').lower()
-                cat = r.get('category', '').lower()
-                if filter_text not in name and filter_text not in cat:
-                    continue
-            group.add(self.create_custom_row(i, r))
-            visible_count += 1
-            
-        if visible_count > 0:
-            self.scroll_content.append(group)
-
-    def ensure_data_dir(self):
-        d = os.path.dirname(self.MY_RECIPES_FILE)
-        if not os.path.exists(d):
-            os.makedirs(d)
-
-    def create_custom_row(self, index, data):
-        row = Adw.ExpanderRow(title=data['name'])
-        row.set_use_markup(False)
-        row.set_subtitle(data.get('category', 'Custom'))
-        row.add_prefix(Gtk.Image.new_from_icon_name("document-edit-symbolic"))
-        
-        box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=12)
-        box.set_margin_top(12)
-        box.set_margin_bottom(12)
-        box.set_margin_start(12)
-        box.set_margin_end(12)
-        
-        # Image
-        if img_path := data.get('image_path'):
-            if os.path.exists(img_path):
-                img = Gtk.Picture.new_for_filename(img_path)
-                img.set_size_request(150, 150)
-                img.set_content_fit(Gtk.ContentFit.COVER)
-                img.set_halign(Gtk.Align.CENTER)
-                img.set_valign(Gtk.Align.CENTER)
-                img.add_css_class("rounded-image")
-                box.append(img)
-        
-        box.append(Gtk.Label(label=data.get('instructions', ''), wrap=True, xalign=0))
-        
-        ingredients = data.get('ingredients', [])
-        if ingredients:
-            ing_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=6)
-            box.append(ing_box)
-            
-            for ing in ingredients:
-                row_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=12)
-                lbl = Gtk.Label(label=f"• {ing}", xalign=0, hexpand=True, css_classes=["dim-label"])
-                btn = Gtk.Button(icon_name="list-add-symbolic")
-                btn.add_css_class("flat")
-                btn.set_tooltip_text("Add to Shopping List")
-                if self.shopping_list_page:
-                    btn.connect("clicked", self.on_add_to_list, ing)
-                else:
-                    btn.set_sensitive(False)
-                row_box.append(lbl)
-                row_box.append(btn)
-                ing_box.append(row_box)
-        
-        actions_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=12)
-        box.append(actions_box)
+    def on_setup_header(self, factory, header):
+        label = Gtk.Label(xalign=0, css_classes=["heading"])
+        label.set_margin_top(24)
+        label.set_margin_bottom(12)
+        header.set_child(label)
 
-        export_btn = Gtk.Button(label="Export", icon_name="document-save-symbolic")
-        export_btn.connect("clicked", self.on_export, data)
-        actions_box.append(export_btn)
+    def on_bind_header(self, factory, header):
+        header.get_child().set_label(SECTIONS[header.get_item().kind][0])
 
-        del_btn = Gtk.Button(label="Delete", icon_name="user-trash-symbolic")
-        del_btn.add_css_class("destructive-action")
-        del_btn.set_hexpand(True)
-        del_btn.set_halign(Gtk.Align.END)
-        del_btn.connect("clicked", self.on_delete_custom, index)
-        actions_box.append(del_btn)
-        
-        row.add_row(box)
-        return row
-
-    def on_delete_custom(self, btn, index):
-        recipes = self.load_json(self.MY_RECIPES_FILE)
-        if 0 <= index < len(recipes):
-            del recipes[index]
-            self.save_json(self.MY_RECIPES_FILE, recipes)
-            self.refresh_all()
-            self.toast_overlay.add_toast(Adw.Toast.new("Recipe deleted"))
-
-    def build_cocktails(self, filter_text=""):
-        favs = self.load_json(self.COCKTAILS_FILE)
-        if not favs:
-            return
-            
-        group = Adw.PreferencesGroup(title="Saved Cocktails")
-        visible_count = 0
-        
-        for d_id, data in favs.items():
-            if filter_text:
-                name = data.get('strDrink', '').lower()
-                cat = data.get('strCategory', '').lower()
-                if filter_text not in name and filter_text not in cat:
-                    continue
-            group.add(self.create_cocktail_row(d_id, data))
-            visible_count += 1
-            
-        if visible_count > 0:
-            self.scroll_content.append(group)
-
-    def create_cocktail_row(self, d_id, data):
-        row = Adw.ExpanderRow(title=data['strDrink'])
+    def on_setup_row(self, factory, list_item):
+        list_item.set_activatable(False)
+
+        row = Adw.ExpanderRow()
         row.set_use_markup(False)
-        row.set_subtitle(data.get('strCategory', 'Unknown'))
-        row.add_prefix(Gtk.Image.new_from_icon_name("drinks-symbolic"))
-        
-        box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=12)
-        box.set_margin_top(12)
-        box.set_margin_bottom(12)
-        box.set_margin_start(12)
-        box.set_margin_end(12)
+        row.item = None
+        row.icon = Gtk.Image()
+        row.add_prefix(row.icon)
+
+        # Details are built the first time the row is expanded
+        row.details = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=12)
+        row.details.set_margin_top(12)
+        row.details.set_margin_bottom(12)
+        row.details.set_margin_start(12)
+        row.details.set_margin_end(12)
+        row.add_row(row.details)
+        row.connect("notify::expanded", self.on_row_expanded)
+
+        frame = Gtk.ListBox(css_classes=["boxed-list"], margin_bottom=6)
+        frame.set_selection_mode(Gtk.SelectionMode.NONE)
+        frame.append(row)
+        frame.row = row
+        list_item.set_child(frame)
+
+    def on_bind_row(self, factory, list_item):
+        item = list_item.get_item()
+        row = list_item.get_child().row
+        row.set_title(item.title)
+        row.set_subtitle(item.subtitle)
+        row.icon.set_from_icon_name(SECTIONS[item.kind][1])
+        row.item = item
+        row.set_expanded(item.expanded)
+
+    def on_unbind_row(self, factory, list_item):
+        row = list_item.get_child().row
+        row.item = None
+        row.set_expanded(False)
+        self.clear_details(row.details)
+
+    def on_row_expanded(self, row, param):
+        item = row.item
+        if item is None:
+            return
+        item.expanded = row.get_expanded()
+        if item.expanded and not row.details.get_first_child():
+            self.populate_details(row.details, item)
+
+    def clear_details(self, box):
+        loader = ImageLoader.get_default()
+        while c := box.get_first_child():
+            if isinstance(c, Gtk.Picture):
+                loader.forget(c)
+            box.remove(c)
+
+    def populate_details(self, box, item):
+        recipe = item.recipe
 
         # Image
-        img = Gtk.Picture()
-        img.set_size_request(150, 150)
-        img.set_content_fit(Gtk.ContentFit.COVER)
-        img.set_halign(Gtk.Align.CENTER)
-        img.set_valign(Gtk.Align.CENTER)
-        img.add_css_class("rounded-image")
-        box.append(img)
-        
-        if thumb := data.get('strDrinkThumb'):
-            threading.Thread(target=self.load_image, args=(f"{thumb}/preview", img), daemon=True).start()
-        
-        box.append(Gtk.Label(label=data.get('strInstructions',''), wrap=True, xalign=0))
-        
-        # Simplified display for collection
-        ings = []
-        for i in range(1, 16):
-            if ing := data.get(f"strIngredient{i}"):
-                meas = (data.get(f"strMeasure{i}") or "").strip()
-                ings.append(f"• {meas} {ing.strip()}")
-        
-        if ings:
+        if item.kind == "custom":
+            if recipe.image_path and os.path.exists(recipe.image_path):
+                box.append(self.create_picture())
+                box.get_last_child().set_filename(recipe.image_path)
+        else:
+            img = self.create_picture()
+            box.append(img)
+            if recipe.thumb:
+                ImageLoader.get_default().load(f"{recipe.thumb}/preview", img, self)
+
+        box.append(Gtk.Label(label=recipe.instructions, wrap=True, xalign=0))
+
+        if recipe.ingredients:
             ing_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=6)
             box.append(ing_box)
-            for ing_str in ings:
-                text = ing_str.lstrip("• ").strip()
+            for ing in recipe.ingredients:
+                text = str(ing)
                 row_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=12)
                 lbl = Gtk.Label(label=f"• {text}", xalign=0, hexpand=True, css_classes=["dim-label"])
                 btn = Gtk.Button(icon_name="list-add-symbolic")
                 btn.add_css_class("flat")
                 btn.set_tooltip_text("Add to Shopping List")
-                if self.shopping_list_page:
-                    btn.connect("clicked", self.on_add_to_list, text)
-                else:
-                    btn.set_sensitive(False)
+                btn.connect("clicked", self.on_add_to_list, ing)
                 row_box.append(lbl)
                 row_box.append(btn)
                 ing_box.append(row_box)
 
+            add_all = Gtk.Button(label="Add All to Shopping List", halign=Gtk.Align.START)
+            add_all.add_css_class("flat")
+            add_all.connect("clicked", self.on_add_all_to_list, recipe)
+            ing_box.append(add_all)
+
         actions_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=12)
         box.append(actions_box)
 
         export_btn = Gtk.Button(label="Export", icon_name="document-save-symbolic")
-        export_btn.connect("clicked", self.on_export, data)
+        export_btn.connect("clicked", self.on_export, recipe)
         actions_box.append(export_btn)
-            
-        del_btn = Gtk.Button(label="Unsave", icon_name="user-trash-symbolic")
+
+        del_btn = Gtk.Button(label="Delete" if item.kind == "custom" else "Unsave", icon_name="user-trash-symbolic")
         del_btn.add_css_class("destructive-action")
         del_btn.set_hexpand(True)
         del_btn.set_halign(Gtk.Align.END)
-        del_btn.connect("clicked", self.on_delete_cocktail, d_id)
+        del_btn.connect("clicked", self.on_delete, item.kind, item.key)
         actions_box.append(del_btn)
-        
-        row.add_row(box)
-        return row
-
-    def on_delete_cocktail(self, btn, d_id):
-        favs = self.load_json(self.COCKTAILS_FILE)
-        if d_id in favs:
-            del favs[d_id]
-            self.save_json(self.COCKTAILS_FILE, favs)
-            self.refresh_all()
-            self.toast_overlay.add_toast(Adw.Toast.new("Cocktail unsaved"))
-
-    def build_meals(self, filter_text=""):
-        favs = self.load_json(self.MEALS_FILE)
-        if not favs:
-            return
-            
-        group = Adw.PreferencesGroup(title="Saved Recipes")
-        visible_count = 0
-        
-        for m_id, data in favs.items():
-            if filter_text:
-                name = data.get('strMeal', '').lower()
-                cat = data.get('strCategory', '').lower()
-                if filter_text not in name and filter_text not in cat:
-                    continue
-            group.add(self.create_meal_row(m_id, data))
-            visible_count += 1
-            
-        if visible_count > 0:
-            self.scroll_content.append(group)
-
-    def create_meal_row(self, m_id, data):
-        title = data.get('strMeal') or "Unknown"
-        row = Adw.ExpanderRow(title=title)
-        row.set_use_markup(False)
-        row.set_subtitle(data.get('strCategory', 'Unknown'))
-        row.add_prefix(Gtk.Image.new_from_icon_name("fast-food-symbolic")) # Generic icon
-        
-        box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=12)
-        box.set_margin_top(12)
-        box.set_margin_bottom(12)
-        box.set_margin_start(12)
-        box.set_margin_end(12)
-        
-        # Image
+
+    def create_picture(self):
         img = Gtk.Picture()
         img.set_size_request(150, 150)
         img.set_content_fit(Gtk.ContentFit.COVER)
         img.set_halign(Gtk.Align.CENTER)
         img.set_valign(Gtk.Align.CENTER)
         img.add_css_class("rounded-image")
-        box.append(img)
-        
-        if thumb := data.get('strMealThumb'):
-            threading.Thread(target=self.load_image, args=(f"{thumb}/preview", img), daemon=True).start()
+        return img
 
-        box.append(Gtk.Label(label=data.get('strInstructions',''), wrap=True, xalign=0))
-        
-        ings = []
-        for i in range(1, 21):
-            if ing := data.get(f"strIngredient{i}"):
-                if not ing.strip(): continue
-                meas = (data.get(f"strMeasure{i}") or "").strip()
-                ings.append(f"• {meas} {ing.strip()}")
-        
-        if ings:
-            ing_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=6)
-            box.append(ing_box)
-            for ing_str in ings:
-                text = ing_str.lstrip("• ").strip()
-                row_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=12)
-                lbl = Gtk.Label(label=f"• {text}", xalign=0, hexpand=True, css_classes=["dim-label"])
-                btn = Gtk.Button(icon_name="list-add-symbolic")
-                btn.add_css_class("flat")
-                btn.set_tooltip_text("Add to Shopping List")
-                if self.shopping_list_page:
-                    btn.connect("clicked", self.on_add_to_list, text)
-                else:
-                    btn.set_sensitive(False)
-                row_box.append(lbl)
-                row_box.append(btn)
-                ing_box.append(row_box)
-
-        actions_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=12)
-        box.append(actions_box)
+    def on_delete(self, btn, kind, key):
+        if kind == "custom":
+            removed = self.repository.remove_recipe(key)
+        else:
+            removed = self.repository.remove_favorite(kind, key)
+        if removed:
+            self.toast_overlay.add_toast(Adw.Toast.new(DELETED_MESSAGES[kind]))
 
-        export_btn = Gtk.Button(label="Export", icon_name="document-save-symbolic")
-        export_btn.connect("clicked", self.on_export, data)
-        actions_box.append(export_btn)
-            
-        del_btn = Gtk.Button(label="Unsave", icon_name="user-trash-symbolic")
-        del_btn.add_css_class("destructive-action")
-        del_btn.set_hexpand(True)
-        del_btn.set_halign(Gtk.Align.END)
-        del_btn.connect("clicked", self.on_delete_meal, m_id)
-        actions_box.append(del_btn)
-        
-        row.add_row(box)
-        return row
-
-    def on_delete_meal(self, btn, m_id):
-        favs = self.load_json(self.MEALS_FILE)
-        if m_id in favs:
-            del favs[m_id]
-            self.save_json(self.MEALS_FILE, favs)
-            self.refresh_all()
-            self.toast_overlay.add_toast(Adw.Toast.new("Meal unsaved"))
-
-    def load_image(self, url, widget):
-        try:
-            r = requests.get(url)
-            GLib.idle_add(self.set_image_texture, widget, r.content)
-        except:
-            pass
-
-    def set_image_texture(self, widget, data):
-        try:
-            loader = GdkPixbuf.PixbufLoader()
-            loader.write(data)
-            loader.close()
-            widget.set_paintable(Gdk.Texture.new_for_pixbuf(loader.get_pixbuf()))
-        except:
-            pass
-        return False
-
-    def on_export(self, btn, data):
+    def on_export(self, btn, recipe):
         def save_callback(dialog, result):
             try:
                 file = dialog.save_finish(result)
                 stream = file.replace(None, False, Gio.FileCreateFlags.NONE, None)
-                
-                # Construct text
-                name = data.get('name') or data.get('strDrink') or data.get('strMeal') or "Recipe"
-                category = data.get('category') or data.get('strCategory') or "Unknown"
-                
-                text = f"Title: {name}\nCategory: {category}\n\nIngredients:\n"
-                
-                # Ingredients
-                if 'ingredients' in data: # Custom
-                    for ing in data['ingredients']:
-                         text += f"- {ing}\n"
-                else: # API
-                     for i in range(1, 21):
-                        ing = data.get(f"strIngredient{i}")
-                        if ing:
-                            meas = (data.get(f"strMeasure{i}") or "").strip()
-                            text += f"- {meas} {ing.strip()}\n"
-                            
-                text += f"\nInstructions:\n{data.get('instructions') or data.get('strInstructions') or ''}\n"
-                
-                stream.write_all(text.encode('utf-8'), None)
+                stream.write_all(recipe.to_text().encode('utf-8'), None)
                 stream.close(None)
                 self.toast_overlay.add_toast(Adw.Toast.new("Exported"))
             except Exception as e:
@@ -476,21 +379,24 @@ class CollectionPage(Adw.Bin):
                 self.toast_overlay.add_toast(Adw.Toast.new("Export failed"))
 
         dialog = Gtk.FileDialog()
-        name = data.get('name') or data.get('strDrink') or data.get('strMeal') or "recipe"
-        safe_name = "".join([c for c in name if c.isalnum() or c in (' ', '-', '_')]).strip()
+        safe_name = "".join([c for c in recipe.name or "recipe" if c.isalnum() or c in (' ', '-', '_')]).strip()
         dialog.set_initial_name(f"{safe_name}.txt")
         dialog.save(self.get_root(), None, save_callback)
 
-    def on_add_to_list(self, btn, text):
-        if self.shopping_list_page.add_item(text):
-            self.toast_overlay.add_toast(Adw.Toast.new(f"Added '{text}' to list"))
-        else:
-            self.toast_overlay.add_toast(Adw.Toast.new(f"'{text}' is already in list"))
+    def on_add_to_list(self, btn, ing):
+        # Amounts of an ingredient already on the list are added up
+        text = str(ing)
+        entry = self.repository.add_shopping_item(ing)
+        self.toast_overlay.add_toast(Adw.Toast.new(f"Added '{text}' to list" if entry == text else f"Shopping list: {entry}"))
+
+    def on_add_all_to_list(self, btn, recipe):
+        self.repository.add_shopping_items(recipe.ingredients)
+        self.toast_overlay.add_toast(Adw.Toast.new(f"Added {len(recipe.ingredients)} ingredients to list"))
 
     def on_add_clicked(self, btn):
         win = self.get_root()
         if hasattr(win, "push_page"):
-            page = AddRecipePage(on_save_callback=self.refresh_all)
+            page = AddRecipePage(self.repository)
             win.push_page(page)
         else:
             print("Root window is not UnifiedWindow or missing push_page")
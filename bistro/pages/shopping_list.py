@@ -1,22 +1,38 @@
-import json
-import os
+import asyncio
+
 import gi
 
 gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
-from gi.repository import Gtk, Adw, GLib
+from gi.repository import Gtk, Adw
+
+from bistro import aio
+from bistro.catalog import Catalog
+from bistro.pantry import PantryMatcher
 
 class ShoppingListPage(Adw.Bin):
-    DATA_FILE = os.path.join(GLib.get_user_data_dir(), "bistro", "shopping_list.json")
+    MAX_MATCHES = 20
 
-    def __init__(self):
+    def __init__(self, repository):
         super().__init__()
-        self.ensure_data_dir()
-        self.items = self.load_items()
-        
+        self.repository = repository
+        self.repository.connect("shopping-list-changed", self.on_shopping_list_changed)
+        self.repository.connect("pantry-changed", lambda repo, text, added: self.refresh_pantry())
+        self.repository.connect("favorite-changed", self.on_favorite_changed)
+        self.repository.connect("recipe-changed", self.on_recipe_changed)
+        self.rows = {}  # shopping list key -> Adw.ActionRow
+        self.tasks = aio.TaskScope(self)
+        # The matcher is only used on the I/O pool, by one match_pantry() at a time
+        self.matcher = None  # PantryMatcher, built on first use
+        self.matcher_generation = None
+        self.catalog_records = {}  # (kind, id) -> catalog Recipe the matcher was built with
+        self.matcher_changes = []  # [((kind, id), Recipe or None)] saved since, for the next match
+        self.matcher_lock = asyncio.Lock()
+        self.match_serial = 0
+
         self.toast_overlay = Adw.ToastOverlay()
         self.set_child(self.toast_overlay)
-        
+
         main_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
         self.toast_overlay.set_child(main_box)
 
@@ -27,74 +43,196 @@ class ShoppingListPage(Adw.Bin):
         header.set_margin_start(24)
         header.set_margin_end(24)
         main_box.append(header)
-        
+
         title = Gtk.Label(label="Shopping List", css_classes=["title-2", "custom-title"])
         header.append(title)
-        
+
+        content = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=12)
+        content.set_margin_top(12)
+        content.set_margin_bottom(24)
+        content.set_margin_start(24)
+        content.set_margin_end(24)
+
         # List
         self.list_box = Gtk.ListBox()
         self.list_box.add_css_class("boxed-list")
         self.list_box.set_selection_mode(Gtk.SelectionMode.NONE)
-        self.list_box.set_margin_top(12)
-        self.list_box.set_margin_bottom(24)
-        self.list_box.set_margin_start(24)
-        self.list_box.set_margin_end(24)
-        
+        self.list_box.set_placeholder(Gtk.Label(label="Your shopping list is empty.", margin_top=20, margin_bottom=20, css_classes=["dim-label"]))
+        content.append(self.list_box)
+
+        # Pantry
+        content.append(Gtk.Label(label="Pantry", xalign=0, margin_top=12, css_classes=["heading"]))
+
+        self.pantry_box = Gtk.ListBox()
+        self.pantry_box.add_css_class("boxed-list")
+        self.pantry_box.set_selection_mode(Gtk.SelectionMode.NONE)
+        content.append(self.pantry_box)
+
+        self.pantry_entry = Adw.EntryRow(title="Add an ingredient you have")
+        self.pantry_entry.set_show_apply_button(True)
+        self.pantry_entry.connect("apply", self.on_add_pantry_item)
+
+        # What can I make?
+        content.append(Gtk.Label(label="What Can I Make?", xalign=0, margin_top=12, css_classes=["heading"]))
+
+        self.matches_box = Gtk.ListBox()
+        self.matches_box.add_css_class("boxed-list")
+        self.matches_box.set_selection_mode(Gtk.SelectionMode.NONE)
+        content.append(self.matches_box)
+
         scroll = Gtk.ScrolledWindow()
         scroll.set_vexpand(True)
-        scroll.set_child(self.list_box)
+        scroll.set_child(content)
         main_box.append(scroll)
-        
-        self.refresh_list()
 
-    def ensure_data_dir(self):
-        d = os.path.dirname(self.DATA_FILE)
-        if not os.path.exists(d):
-            os.makedirs(d)
+        for key in self.repository.shopping_list:
+            self.add_row(key)
+        self.refresh_pantry()
 
-    def load_items(self):
-        if os.path.exists(self.DATA_FILE):
-            try:
-                with open(self.DATA_FILE, 'r') as f:
-                    return json.load(f)
-            except:
-                pass
-        return []
-
-    def save_items(self):
-        try:
-            with open(self.DATA_FILE, 'w') as f:
-                json.dump(self.items, f, indent=4)
-        except:
-            pass
-
-    def add_item(self, item_text):
-        if item_text not in self.items:
-            self.items.append(item_text)
-            self.save_items()
-            self.refresh_list()
-            return True # Added
-        return False # Duplicate
-
-    def remove_item(self, row, item_text):
-        if item_text in self.items:
-            self.items.remove(item_text)
-            self.save_items()
-            self.refresh_list() 
-
-    def refresh_list(self):
-        # Clear
-        while child := self.list_box.get_first_child():
-            self.list_box.remove(child)
-            
-        if not self.items:
-             self.list_box.append(Gtk.Label(label="Your shopping list is empty.", margin_top=20, css_classes=["dim-label"]))
-             return
-
-        for item in self.items:
+    def on_bought(self, btn, key):
+        # Bought items move from the shopping list into the pantry
+        name = self.repository.shopping_list.name(key)
+        self.repository.remove_shopping_item(key)
+        self.repository.add_pantry_item(name)
+
+    def on_shopping_list_changed(self, repository, key, present):
+        # Only the row of the entry that changed is touched
+        if not present:
+            if row := self.rows.pop(key, None):
+                self.list_box.remove(row)
+        elif row := self.rows.get(key):
+            row.set_title(repository.shopping_list.text(key))
+        else:
+            self.add_row(key)
+
+    def add_row(self, key):
+        row = Adw.ActionRow(title=self.repository.shopping_list.text(key))
+        row.set_use_markup(False)
+        bought = Gtk.Button(icon_name="object-select-symbolic", tooltip_text="Move to Pantry")
+        bought.add_css_class("flat")
+        bought.connect("clicked", self.on_bought, key)
+        row.add_suffix(bought)
+        btn = Gtk.Button(icon_name="user-trash-symbolic")
+        btn.add_css_class("flat")
+        btn.connect("clicked", lambda b: self.repository.remove_shopping_item(key))
+        row.add_suffix(btn)
+        self.list_box.append(row)
+        self.rows[key] = row
+
+    # Pantry
+
+    def on_add_pantry_item(self, entry):
+        text = entry.get_text().strip()
+        if not text:
+            return
+        if self.repository.add_pantry_item(text):
+            entry.set_text("")
+        else:
+            self.toast_overlay.add_toast(Adw.Toast.new(f"'{text}' is already in the pantry"))
+
+    def refresh_pantry(self):
+        while child := self.pantry_box.get_first_child():
+            self.pantry_box.remove(child)
+
+        for item in self.repository.pantry:
             row = Adw.ActionRow(title=item)
             btn = Gtk.Button(icon_name="user-trash-symbolic")
             btn.add_css_class("flat")
-            btn.connect("clicked", lambda b, i=item, r=row: self.remove_item(r, i))
+            btn.connect("clicked", lambda b, i=item: self.repository.remove_pantry_item(i))
             row.add_suffix(btn)
-            self.list_box.append(row)
+            self.pantry_box.append(row)
+        self.pantry_box.append(self.pantry_entry)
+
+        self.refresh_matches()
+
+    def on_favorite_changed(self, repository, kind, item_id, saved):
+        self.matcher_changes.append(((kind, item_id), repository.favorites[kind][item_id] if saved else None))
+        self.refresh_matches()
+
+    def on_recipe_changed(self, repository, r_id, present):
+        self.matcher_changes.append((("custom", r_id), repository.recipes[r_id] if present else None))
+        self.refresh_matches()
+
+    def refresh_matches(self):
+        self.tasks.cancel()
+        self.match_serial += 1
+        self.tasks.spawn(self.update_matches(list(self.repository.pantry)))
+
+    async def run_matcher(self, serial, pantry):
+        # Not cancelled with the page's tasks: a pool job that has started
+        # finishes before the next one may touch the matcher
+        async with self.matcher_lock:
+            if serial != self.match_serial:
+                return None
+
+            # Saved and custom recipes and, when enabled, the offline
+            # catalog. Everything read from the repository is copied here,
+            # on the main thread.
+            catalog = Catalog.get_default()
+            generation = (catalog.enabled, catalog.generation)
+            saved = None
+            if self.matcher is None or self.matcher_generation != generation:
+                saved = [*((("custom", r_id), r) for r_id, r in self.repository.recipes.items()),
+                         *(((kind, key), r) for kind, favs in self.repository.favorites.items() for key, r in favs.items())]
+                self.matcher_changes.clear()
+            changes, self.matcher_changes = self.matcher_changes, []
+            try:
+                matches = await aio.run_io(self.match_pantry, pantry, saved, changes, catalog.enabled)
+            except Exception as e:
+                print(f"Pantry matching failed: {e}")
+                self.matcher_generation = None  # Start over next time
+                return None
+            if saved is not None:
+                self.matcher_generation = generation
+            return matches
+
+    def match_pantry(self, pantry, saved, changes, catalog_enabled, cancel=None):
+        # Runs on the I/O pool. saved is set when the matcher is rebuilt.
+        if saved is not None:
+            records = {}
+            if catalog_enabled:
+                catalog = Catalog.get_default()
+                for kind in ("meal", "cocktail"):
+                    records.update(((r.kind, r.id), r) for r in catalog.records(kind))
+            self.catalog_records = records
+            matcher = PantryMatcher()
+            for key, recipe in records.items():
+                matcher.add(key, recipe)
+            # Saved copies replace the catalog's, so each recipe is listed once
+            for key, recipe in saved:
+                matcher.add(key, recipe)
+            self.matcher = matcher
+
+        for key, recipe in changes:
+            # An unsaved favorite falls back to its catalog copy, if any
+            if recipe := recipe or self.catalog_records.get(key):
+                self.matcher.add(key, recipe)
+            else:
+                self.matcher.remove(key)
+        return self.matcher.match(pantry, limit=self.MAX_MATCHES)
+
+    async def update_matches(self, pantry):
+        matches = []
+        if pantry:
+            task = aio.spawn(self.run_matcher(self.match_serial, pantry), name="pantry match")
+            matches = await asyncio.shield(task)
+            if matches is None:
+                return  # Superseded or failed
+
+        while child := self.matches_box.get_first_child():
+            self.matches_box.remove(child)
+
+        if not matches:
+            msg = "No saved recipes use what you have." if pantry else "Add ingredients you have to see what you can make."
+            self.matches_box.append(Gtk.Label(label=msg, wrap=True, margin_top=20, margin_bottom=20, css_classes=["dim-label"]))
+            return
+
+        for recipe, coverage, missing in matches:
+            row = Adw.ActionRow(title=recipe.title)
+            row.set_use_markup(False)
+            if missing:
+                row.set_subtitle(f"{coverage:.0%} · Missing: {', '.join(missing)}")
+            else:
+                row.set_subtitle("You have everything")
+            row.set_subtitle_lines(2)
+            self.matches_box.append(row)
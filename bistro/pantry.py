@@ -0,0 +1,145 @@
+from bistro.ingredients import parse_ingredient
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def display_ingredients(recipe):
+    """Return {normalized name: name as written} for a Recipe."""
+    result = {}
+    for ing in recipe.ingredients:
+        parsed = ing.parsed
+        if key := parsed.key:
+            result.setdefault(key, parsed.name)
+    return result
+
+
+class PantryMatcher:
+    """Ranks recipes by how much of them can be made from a pantry.
+
+    The ingredient -> recipe index is one bitmap per normalized ingredient
+    with a bit per recipe, packed with NumPy. Scoring a pantry unpacks the
+    bitmaps of the ingredients on hand and sums them in one vectorized
+    step, so it costs the same whether there are ten recipes or thousands.
+    Without NumPy recipes are scored one by one.
+
+    Recipes are added and removed one at a time, keyed by (kind, id). Only
+    the changed recipe is parsed; the bitmaps are packed again on the next
+    match. A matcher is not thread-safe, so use it from one thread at a time.
+
+    Pantry items and ingredients are compared by their parsed names, so
+    "2 cups flour" is flour. A pantry item covers an ingredient if either
+    one's words contain the other's: "chicken" covers "chicken breast" and
+    "chicken breast" covers "chicken".
+    """
+
+    def __init__(self, records=()):
+        self.records = []  # slot -> Recipe, None once removed
+        self.ingredients = []  # slot -> {normalized: display name}
+        self.slots = {}  # (kind, id) -> slot
+        self.vocab = {}  # normalized ingredient -> row
+        self.words = {}  # word -> normalized ingredients containing it
+        self.bitmaps = None  # Packed on the next match after a change
+        for recipe in records:
+            self.add((recipe.kind, recipe.id), recipe)
+
+    def __len__(self):
+        return len(self.slots)
+
+    def add(self, key, recipe):
+        """Add recipe under key, replacing whatever key held."""
+        self.remove(key)
+        ings = display_ingredients(recipe)
+        if not ings:
+            return
+        self.slots[key] = len(self.records)
+        self.records.append(recipe)
+        self.ingredients.append(ings)
+        for name in ings:
+            if name not in self.vocab:
+                self.vocab[name] = len(self.vocab)
+                for word in name.split():
+                    self.words.setdefault(word, set()).add(name)
+        self.bitmaps = None
+
+    def remove(self, key):
+        if (slot := self.slots.pop(key, None)) is None:
+            return
+        self.records[slot] = None
+        self.ingredients[slot] = {}
+        self.bitmaps = None
+
+    def compact(self):
+        live = sorted(self.slots.items(), key=lambda item: item[1])
+        self.records = [self.records[slot] for _, slot in live]
+        self.ingredients = [self.ingredients[slot] for _, slot in live]
+        self.slots = {key: i for i, (key, _) in enumerate(live)}
+        self.bitmaps = None
+
+    def pack(self):
+        rows, cols = [], []
+        for i, ings in enumerate(self.ingredients):
+            for name in ings:
+                rows.append(self.vocab[name])
+                cols.append(i)
+        bits = np.zeros((len(self.vocab), len(self.records)), dtype=bool)
+        bits[rows, cols] = True
+        self.bitmaps = np.packbits(bits, axis=1)
+        # Removed slots have no ingredients and so never score
+        self.sizes = np.array([len(ings) or 1 for ings in self.ingredients], dtype=np.float32)
+
+    def covered(self, pantry):
+        """Return the normalized ingredients the pantry items cover."""
+        have = set()
+        for item in pantry:
+            words = parse_ingredient(item).key.split()
+            if not words:
+                continue
+            # Ingredients containing every word of the item...
+            names = set(self.words.get(words[0], ()))
+            for word in words[1:]:
+                names &= self.words.get(word, set())
+            have |= names
+            # ...and ingredients whose words are all in the item
+            item_words = set(words)
+            for word in item_words:
+                have.update(n for n in self.words.get(word, ()) if item_words.issuperset(n.split()))
+        return have
+
+    def match(self, pantry, limit=50):
+        """Return [(recipe, coverage, missing)] best first.
+
+        coverage is the fraction of the recipe's ingredients in the pantry
+        and missing lists the others as written in the recipe. Recipes
+        using nothing from the pantry are left out.
+        """
+        have = self.covered(pantry)
+        if not have or not self.slots:
+            return []
+
+        # Drop the slots of removed recipes once they are the majority
+        if len(self.slots) < len(self.records) // 2:
+            self.compact()
+
+        if np is not None:
+            if self.bitmaps is None:
+                self.pack()
+            cols = sorted(self.vocab[name] for name in have)
+            counts = np.unpackbits(self.bitmaps[cols], axis=1, count=len(self.records)).sum(axis=0)
+            coverage = counts / self.sizes
+            order = np.argsort(-coverage, kind="stable")[:limit]
+            top = [(int(i), float(coverage[i])) for i in order if coverage[i] > 0]
+        else:
+            scored = []
+            for i, ings in enumerate(self.ingredients):
+                if hits := sum(1 for name in ings if name in have):
+                    scored.append((-hits / len(ings), i))
+            scored.sort()
+            top = [(i, -score) for score, i in scored[:limit]]
+
+        return [
+            (self.records[i], score, [shown for name, shown in self.ingredients[i].items() if name not in have])
+            for i, score in top
+        ]
@@ -0,0 +1,132 @@
+"""Opt-in timing instrumentation, written as a Chrome trace.
+
+Set BISTRO_TRACE to a file name, or run main.py with --trace, and every
+span, counter and thread started is recorded and written out when the
+application exits. Load the file in chrome://tracing or Perfetto.
+
+Tracing must be enabled before the bistro modules are imported: traced()
+leaves functions untouched when it is off, so it costs nothing then.
+"""
+
+import atexit
+import functools
+import inspect
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+ENV_VAR = "BISTRO_TRACE"
+
+_path = None
+_events = []
+_counters = {}
+_lock = threading.Lock()
+_ids = itertools.count(1)
+_pid = os.getpid()
+
+
+def _now():
+    return time.perf_counter_ns() // 1000  # trace timestamps are in µs
+
+
+def enabled():
+    return _path is not None
+
+
+def enable(path):
+    """Record events from now on and write them to path at exit."""
+    global _path
+    if _path is not None:
+        return
+    _path = path
+
+    # Count every thread started, including the I/O pool's
+    start = threading.Thread.start
+
+    def counting_start(thread):
+        count("threads started")
+        _emit({"name": "thread", "ph": "i", "s": "t", "args": {"name": thread.name}})
+        return start(thread)
+
+    threading.Thread.start = counting_start
+    atexit.register(write)
+
+
+def _emit(event):
+    event.setdefault("ts", _now())
+    event.setdefault("pid", _pid)
+    event.setdefault("tid", threading.get_ident())
+    with _lock:
+        _events.append(event)
+
+
+@contextmanager
+def _span(name, args):
+    start = _now()
+    try:
+        yield
+    finally:
+        _emit({"name": name, "ph": "X", "ts": start, "dur": _now() - start, "args": args})
+
+
+def span(name, **args):
+    """Context manager timing the code inside it."""
+    return _span(name, args) if _path is not None else nullcontext()
+
+
+def count(name, delta=1):
+    """Add delta to a counter, drawn as a graph over time."""
+    if _path is None:
+        return
+    with _lock:
+        value = _counters[name] = _counters.get(name, 0) + delta
+    _emit({"name": name, "ph": "C", "args": {name: value}})
+
+
+def traced(name=None):
+    """Decorator timing each call of a function or coroutine function.
+
+    Coroutines interleave on the main thread, so they are recorded as
+    async spans, which the viewer draws on their own tracks.
+    """
+    def decorate(func):
+        if _path is None:
+            return func
+        label = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                span_id = next(_ids)
+                _emit({"name": label, "cat": "async", "ph": "b", "id": span_id})
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    _emit({"name": label, "cat": "async", "ph": "e", "id": span_id})
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with _span(label, {}):
+                    return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def write():
+    with _lock:
+        events = list(_events)
+    names = [{"name": "thread_name", "ph": "M", "pid": _pid, "tid": t.ident, "args": {"name": t.name}}
+             for t in threading.enumerate()]
+    try:
+        with open(_path, "w") as f:
+            json.dump({"traceEvents": names + events, "displayTimeUnit": "ms"}, f)
+        print(f"Trace: wrote {len(events)} events to {_path}")
+    except OSError as e:
+        print(f"Trace: failed to write {_path}: {e}")
+
+
+if os.environ.get(ENV_VAR):
+    enable(os.environ[ENV_VAR])
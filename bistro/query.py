@@ -0,0 +1,138 @@
+import re
+
+from bistro.ingredients import normalize_ingredient
+
+FIELD_RE = re.compile(r"(ingredient|category|cat|area)\s*:\s*(.+)", re.IGNORECASE)
+AND_RE = re.compile(r",|\band\b", re.IGNORECASE)
+OR_RE = re.compile(r"\||\bor\b", re.IGNORECASE)
+
+FIELDS = {"ingredient": "i", "category": "c", "cat": "c", "area": "a"}
+
+
+def record_ingredients(recipe):
+    return {key for key in (ing.key for ing in recipe.ingredients) if key}
+
+
+def parse(text):
+    """Split a query into AND-ed clauses of OR-ed terms.
+
+    "chicken, garlic | shallot, -pork, area:italian" becomes
+    [(False, [("i", "chicken")]), (False, [("i", "garlic"), ("i", "shallot")]),
+     (True, [("i", "pork")]), (False, [("a", "italian")])].
+    Clauses are separated by commas or "and", alternatives by "|" or "or",
+    and a leading "-" or "not" negates a clause.
+    """
+    clauses = []
+    for part in AND_RE.split(text):
+        part = part.strip()
+        negated = False
+        if part.startswith("-"):
+            negated, part = True, part[1:]
+        elif part.lower().startswith("not "):
+            negated, part = True, part[4:]
+
+        terms = []
+        for alt in OR_RE.split(part):
+            alt = alt.strip()
+            field = "i"
+            if m := FIELD_RE.match(alt):
+                field, alt = FIELDS[m.group(1).lower()], m.group(2).strip()
+            if alt:
+                terms.append((field, alt))
+        if terms:
+            clauses.append((negated, terms))
+    return clauses
+
+
+class RecipeQuery:
+    """Boolean ingredient, category and area queries over a set of recipes.
+
+    Every recipe gets a bit position; each normalized ingredient, category
+    and area has a posting list stored as an int bitset, so AND, OR and NOT
+    are single integer operations however many recipes there are. An
+    ingredient term matches every ingredient containing all of its words,
+    e.g. "chicken" matches "chicken breast" and "chicken stock".
+
+    Matches are ranked by how many of the asked-for ingredients they use,
+    so "chicken | garlic | lemon" lists recipes with all three first, then
+    by the share of their own ingredients that covers.
+    """
+
+    def __init__(self, records=()):
+        self.records = []  # bit position -> Recipe
+        self.ingredients = []  # bit position -> set of normalized ingredients
+        self.postings = {}  # "i:<ingredient>", "c:<category>" or "a:<area>" -> bitset
+        self.words = {}  # word -> normalized ingredients containing it
+        for recipe in records:
+            self.add(recipe)
+
+    def __len__(self):
+        return len(self.records)
+
+    def add(self, recipe):
+        bit = 1 << len(self.records)
+        ingredients = record_ingredients(recipe)
+        self.records.append(recipe)
+        self.ingredients.append(ingredients)
+
+        terms = [f"i:{name}" for name in ingredients]
+        if recipe.category:
+            terms.append(f"c:{normalize_ingredient(recipe.category)}")
+        if recipe.area:
+            terms.append(f"a:{normalize_ingredient(recipe.area)}")
+        for term in terms:
+            self.postings[term] = self.postings.get(term, 0) | bit
+
+        for name in ingredients:
+            for word in name.split():
+                self.words.setdefault(word, set()).add(name)
+
+    def ingredient_bits(self, text):
+        words = normalize_ingredient(text).split()
+        if not words:
+            return 0
+        names = set(self.words.get(words[0], ()))
+        for word in words[1:]:
+            names &= self.words.get(word, set())
+        bits = 0
+        for name in names:
+            bits |= self.postings[f"i:{name}"]
+        return bits
+
+    def term_bits(self, field, value):
+        if field == "i":
+            return self.ingredient_bits(value)
+        return self.postings.get(f"{field}:{normalize_ingredient(value)}", 0)
+
+    def query(self, text, limit=200):
+        """Return [(recipe, hits, coverage)] for text, best first.
+
+        hits is how many of the query's ingredients the recipe uses,
+        coverage the fraction of its ingredients they account for.
+        """
+        clauses = parse(text)
+        if not clauses:
+            return []
+
+        matched = (1 << len(self.records)) - 1
+        wanted = []  # bitsets of the positive ingredient terms, for ranking
+        for negated, terms in clauses:
+            bits = 0
+            for field, value in terms:
+                term = self.term_bits(field, value)
+                bits |= term
+                if field == "i" and not negated:
+                    wanted.append(term)
+            matched &= ~bits if negated else bits
+
+        # Bitsets as strings, lowest bit first, to test bit i in constant time
+        wanted = [bin(bits)[:1:-1] for bits in wanted]
+        ranked = []
+        for i, bit in enumerate(bin(matched)[:1:-1]):
+            if bit != "1":
+                continue
+            hits = sum(1 for bits in wanted if i < len(bits) and bits[i] == "1")
+            coverage = hits / len(self.ingredients[i]) if self.ingredients[i] else 0
+            ranked.append((-hits, -coverage, i))
+        ranked.sort()
+        return [(self.records[i], -hits, -coverage) for hits, coverage, i in ranked[:limit]]
@@ -0,0 +1,167 @@
+from gi.repository import GObject
+
+from bistro.ingredients import parse_ingredient
+from bistro.model import FORMAT, Recipe
+from bistro.search_index import SearchIndex
+from bistro.shopping import ShoppingList
+from bistro.storage import Storage
+
+FAVORITE_KINDS = ("cocktail", "meal")
+
+
+class Repository(GObject.Object):
+    """In-memory copy of the user's favorites, custom recipes, shopping list
+    and pantry, shared by every page.
+
+    The data is read from Storage once, when the application starts, and
+    recipes are held as model.Recipe objects; rows stored before that
+    format existed are converted and written back. Every change goes
+    through here: it is written to Storage, mirrored into the search index
+    and announced with a signal, so pages update themselves instead of
+    reloading anything from disk.
+
+    Signals:
+        favorite-changed (kind, id, saved)
+        recipe-changed (id, present)
+        shopping-list-changed (key, present)
+        pantry-changed (text, added)
+    """
+
+    __gsignals__ = {
+        "favorite-changed": (GObject.SignalFlags.RUN_FIRST, None, (str, str, bool)),
+        "recipe-changed": (GObject.SignalFlags.RUN_FIRST, None, (str, bool)),
+        "shopping-list-changed": (GObject.SignalFlags.RUN_FIRST, None, (str, bool)),
+        "pantry-changed": (GObject.SignalFlags.RUN_FIRST, None, (str, bool)),
+    }
+
+    def __init__(self, storage=None, index=None):
+        super().__init__()
+        self.storage = storage or Storage.get_default()
+        self.index = index or SearchIndex.get_default()
+
+        self.favorites = {kind: self.load_favorites(kind) for kind in FAVORITE_KINDS}
+        self.recipes = self.load_recipes()
+        self.shopping_list = self.load_shopping_list()
+        self.pantry = self.storage.get_pantry()
+
+        for kind, favs in self.favorites.items():
+            self.index.sync(kind, favs)
+        self.index.sync("custom", self.recipes)
+
+    def load_favorites(self, kind):
+        favorites = {}
+        for item_id, data in self.storage.get_favorites(kind).items():
+            favorites[item_id] = recipe = Recipe.from_dict(kind, data)
+            if data.get('format') != FORMAT:
+                self.storage.put_favorite(kind, item_id, recipe.to_dict())
+        return favorites
+
+    def load_recipes(self):
+        recipes = {}
+        for data in self.storage.get_recipes():
+            recipe = Recipe.from_dict("custom", data)
+            if data.get('format') != FORMAT:
+                self.storage.put_recipe(recipe.to_dict())
+            recipes[recipe.id] = recipe
+        return recipes
+
+    def load_shopping_list(self):
+        rows = self.storage.get_shopping_list()
+        shopping_list = ShoppingList(rows)
+        # Lines merged or keyed while loading, e.g. stored before either
+        # existed, are written back: later changes update rows by key and text
+        if shopping_list.rows() != rows:
+            self.storage.replace_shopping_list(shopping_list.rows())
+        return shopping_list
+
+    # Favorites
+
+    def is_favorite(self, kind, item_id):
+        return item_id in self.favorites[kind]
+
+    def save_favorite(self, kind, item_id, recipe):
+        self.favorites[kind][item_id] = recipe
+        self.storage.put_favorite(kind, item_id, recipe.to_dict())
+        self.index.add(kind, item_id, recipe)
+        self.emit("favorite-changed", kind, item_id, True)
+
+    def remove_favorite(self, kind, item_id):
+        if self.favorites[kind].pop(item_id, None) is None:
+            return False
+        self.storage.delete_favorite(kind, item_id)
+        self.index.remove(kind, item_id)
+        self.emit("favorite-changed", kind, item_id, False)
+        return True
+
+    # Custom recipes
+
+    def save_recipe(self, recipe):
+        """Add or update a custom recipe, giving it an id if it has none, and return the id."""
+        r_id = recipe.id = self.storage.put_recipe(recipe.to_dict())
+        self.recipes[r_id] = recipe
+        self.index.add("custom", r_id, recipe)
+        self.emit("recipe-changed", r_id, True)
+        return r_id
+
+    def remove_recipe(self, r_id):
+        if self.recipes.pop(r_id, None) is None:
+            return False
+        self.storage.delete_recipe(r_id)
+        self.index.remove("custom", r_id)
+        self.emit("recipe-changed", r_id, False)
+        return True
+
+    # Shopping list
+
+    def add_shopping_item(self, item):
+        """Add a line of text or an Ingredient to the shopping list, merged
+        with what is already there. Returns the entry's text afterwards."""
+        return self.add_shopping_items([item])[0]
+
+    def add_shopping_items(self, lines):
+        """Add several lines or Ingredients, e.g. every ingredient of a
+        recipe, in one write. Returns the text of each one's entry afterwards."""
+        changes = []
+        keys = []
+        for line in lines:
+            change = self.shopping_list.add(line)
+            changes.append(change)
+            keys.append(change[0])
+        self.storage.write_shopping_items(changes)
+        for key in dict.fromkeys(keys):
+            self.emit("shopping-list-changed", key, True)
+        return [self.shopping_list.text(key) for key in keys]
+
+    def remove_shopping_item(self, key):
+        if key not in self.shopping_list:
+            return False
+        self.storage.write_shopping_items(self.shopping_list.remove(key))
+        self.emit("shopping-list-changed", key, False)
+        return True
+
+    # Pantry
+
+    def find_pantry_item(self, text):
+        """Return the pantry item naming the same ingredient as text, if any."""
+        key = parse_ingredient(text).key or text
+        for item in self.pantry:
+            if (parse_ingredient(item).key or item) == key:
+                return item
+        return None
+
+    def add_pantry_item(self, text):
+        """Add text to the pantry. Returns False if the ingredient was already there."""
+        if self.find_pantry_item(text) is not None:
+            return False
+        self.pantry.append(text)
+        self.storage.add_pantry_item(text)
+        self.emit("pantry-changed", text, True)
+        return True
+
+    def remove_pantry_item(self, text):
+        if text not in self.pantry:
+            return False
+        self.pantry.remove(text)
+        self.storage.remove_pantry_item(text)
+        self.emit("pantry-changed", text, False)
+        return True
@@ -0,0 +1,61 @@
+import os
+
+from gi.repository import Gdk, Gio, GLib, Gtk
+
+RESOURCE_FILE = "bistro.gresource"
+BASE_PATH = "/com/github/cadmiumcmyk/Bistro"
+
+# The symbolic icons sit at the top of the bundle, the app icon under icons/
+ICON_PATHS = (BASE_PATH, f"{BASE_PATH}/icons")
+
+_resource = None  # The registered Gio.Resource, False once loading failed
+_displays = set()  # Displays already given the icons and stylesheet
+
+
+def candidates():
+    # In the Flatpak the bundle is installed next to the package, in
+    # /app/bin, and in a source checkout it is built in the repository
+    # root; both are the package's parent. Fall back to the working
+    # directory for builds elsewhere.
+    yield os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), RESOURCE_FILE)
+    yield os.path.join(os.getcwd(), RESOURCE_FILE)
+
+
+def register():
+    """Map bistro.gresource into memory and register it, once.
+
+    Returns whether the bundle is available. A missing or broken bundle is
+    reported the first time only.
+    """
+    global _resource
+    if _resource is None:
+        _resource = False
+        path = next((p for p in candidates() if os.path.exists(p)), None)
+        if path is None:
+            print(f"Resources: {RESOURCE_FILE} not found")
+            return False
+        try:
+            # The file's pages are shared with the resource, not copied
+            data = GLib.MappedFile.new(path, False).get_bytes()
+            resource = Gio.Resource.new_from_data(data)
+            Gio.resources_register(resource)
+            _resource = resource
+        except GLib.Error as e:
+            print(f"Resources: failed to load {path}: {e.message}")
+    return bool(_resource)
+
+
+def setup_display(display=None):
+    """Add the bundled icons and stylesheet to display, once per display."""
+    display = display or Gdk.Display.get_default()
+    if display in _displays or not register():
+        return
+    _displays.add(display)
+
+    icon_theme = Gtk.IconTheme.get_for_display(display)
+    for path in ICON_PATHS:
+        icon_theme.add_resource_path(path)
+
+    css_provider = Gtk.CssProvider()
+    css_provider.load_from_resource(f"{BASE_PATH}/style.css")
+    Gtk.StyleContext.add_provider_for_display(display, css_provider, Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION)
@@ -0,0 +1,108 @@
+import asyncio
+
+from gi.repository import GObject
+
+from bistro import aio, net
+from bistro.cache import ResponseCache
+
+
+class SearchResult(GObject.Object):
+    """One search result in a page's list model.
+
+    Result rows are recycled as they scroll, so whatever a row should come
+    back with lives here: whether it was expanded and the full Recipe once
+    it has been looked up.
+    """
+
+    def __init__(self, recipe):
+        super().__init__()
+        self.recipe = recipe
+        self.details = None
+        self.expanded = False
+
+
+class SearchController:
+    """Debounced, cancellable search runner shared by the search pages.
+
+    Each submit() becomes a task that sleeps for debounce_ms and then awaits
+    fetch(url, query, *extra, cancel=event) on the I/O pool. Submitting a new
+    search cancels the previous task, which aborts its HTTP transfer, so
+    on_results(results, query) is only ever called for the latest search.
+    Submitting the search that is already pending or in flight is a no-op.
+    Tasks are owned by widget and cancelled when it goes away.
+    """
+
+    DEBOUNCE_MS = 300
+
+    def __init__(self, fetch, on_results, widget=None, debounce_ms=None):
+        self.fetch = fetch
+        self.on_results = on_results
+        self.debounce_ms = self.DEBOUNCE_MS if debounce_ms is None else debounce_ms
+        self.scope = aio.TaskScope(widget)
+        self.current = None  # (key, task) of the latest search
+
+    def submit(self, query, url, *extra, immediate=False):
+        """Start a search and return its task."""
+        key = (query, url)
+        if self.current and self.current[0] == key and not self.current[1].done():
+            return self.current[1]
+
+        self.cancel()
+        delay = 0 if immediate else self.debounce_ms / 1000
+        task = self.scope.spawn(self.run(delay, url, query, extra), name=f"search {url}")
+        self.current = (key, task)
+        return task
+
+    async def run(self, delay, url, query, extra):
+        if delay:
+            await asyncio.sleep(delay)
+        try:
+            results = await aio.run_io(self.fetch, url, query, *extra)
+        except net.Cancelled:
+            return
+        except Exception as e:
+            print(f"Search for {url} failed: {e}")
+            results = []
+        self.on_results(results, query)
+
+    def cancel(self):
+        """Drop the pending or in-flight search, if any."""
+        if self.current:
+            self.current[1].cancel()
+            self.current = None
+
+
+class Prefetcher:
+    """Warms the response cache with detail lookups for fresh results.
+
+    prefetch(urls) fetches the first top_n urls in the background, at most
+    max_concurrent at a time, so expanding one of those rows later is a
+    cache hit. A new prefetch() or cancel() abandons whatever is still
+    queued or downloading. Tasks are owned by widget, like SearchController.
+    """
+
+    TOP_N = 12
+    MAX_CONCURRENT = 3
+
+    def __init__(self, widget=None, top_n=None, max_concurrent=None):
+        self.top_n = top_n or self.TOP_N
+        self.max_concurrent = max_concurrent or self.MAX_CONCURRENT
+        self.scope = aio.TaskScope(widget)
+
+    def prefetch(self, urls):
+        self.cancel()
+        slots = asyncio.Semaphore(self.max_concurrent)
+        for url in urls[:self.top_n]:
+            self.scope.spawn(self.fetch(slots, url), name=f"prefetch {url}")
+
+    async def fetch(self, slots, url):
+        async with slots:
+            try:
+                await aio.run_io(ResponseCache.get_default().get_json, url)
+            except net.Cancelled:
+                pass
+            except Exception as e:
+                print(f"Prefetch of {url} failed: {e}")
+
+    def cancel(self):
+        self.scope.cancel()
@@ -0,0 +1,130 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+
+from gi.repository import GLib
+
+from bistro.model import Recipe
+from bistro.storage import WriteBehind
+
+# Column weights for ranking: a match in the name beats one in the method
+WEIGHTS = (10.0, 4.0, 2.0, 1.0)
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def document_fields(recipe):
+    """Return (name, category, ingredients, instructions) text for a Recipe."""
+    category = " ".join(filter(None, (recipe.category, recipe.area, recipe.alcoholic)))
+    ingredients = "\n".join(ing.name for ing in recipe.ingredients)
+    return recipe.name, category, ingredients, recipe.instructions
+
+
+def match_expression(query):
+    """Turn free text into an FTS5 query where every token is a prefix match."""
+    tokens = TOKEN_RE.findall(query.lower())
+    return " ".join(f'"{t}"*' for t in tokens)
+
+
+class SearchIndex(WriteBehind):
+    """Full-text index over saved favorites and custom recipes.
+
+    Backed by an SQLite FTS5 table in the user data directory. Each document
+    is identified by (kind, key), where kind is "cocktail", "meal" or
+    "custom", and carries a copy of the Recipe so results can be shown
+    without going back to storage.
+
+    add() and remove() are committed by a writer thread, like Storage's
+    changes; searches wait for them first.
+    """
+
+    INDEX_FILE = os.path.join(GLib.get_user_data_dir(), "bistro", "index.db")
+
+    _default = None
+
+    @classmethod
+    def get_default(cls):
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    def __init__(self, path=None):
+        self.path = path or self.INDEX_FILE
+        d = os.path.dirname(self.path)
+        if d and not os.path.exists(d):
+            os.makedirs(d)
+        self.lock = threading.Lock()
+        self.init_writer()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS docs USING fts5("
+            "kind UNINDEXED, key UNINDEXED, data UNINDEXED, "
+            "name, category, ingredients, instructions, "
+            "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        self.conn.commit()
+
+    def add(self, kind, key, recipe):
+        self.queue_many(("doc", kind, str(key)), [self.delete(kind, key), self.insert(kind, key, recipe)])
+
+    def remove(self, kind, key):
+        self.queue(("doc", kind, str(key)), *self.delete(kind, key))
+
+    @staticmethod
+    def delete(kind, key):
+        return "DELETE FROM docs WHERE kind = ? AND key = ?", (kind, str(key))
+
+    @staticmethod
+    def insert(kind, key, recipe):
+        return (
+            "INSERT INTO docs (kind, key, data, name, category, ingredients, instructions) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (kind, str(key), json.dumps(recipe.to_dict()), *document_fields(recipe)),
+        )
+
+    def keys(self, kind):
+        self.flush()
+        with self.lock:
+            return {k for (k,) in self.conn.execute("SELECT key FROM docs WHERE kind = ?", (kind,))}
+
+    def sync(self, kind, docs):
+        """Make the index hold exactly docs ({key: Recipe}) for kind."""
+        indexed = self.keys(kind)
+        wanted = {str(k) for k in docs}
+        if indexed == wanted:
+            return
+        with self.lock, self.conn:
+            for key in indexed - wanted:
+                self.conn.execute(*self.delete(kind, key))
+            for key, recipe in docs.items():
+                if str(key) not in indexed:
+                    self.conn.execute(*self.insert(kind, key, recipe))
+
+    def search(self, query, kinds=None, limit=200):
+        """Return [(kind, key, Recipe)] matching every token of query, best first."""
+        expr = match_expression(query)
+        if not expr:
+            return []
+
+        sql = "SELECT kind, key, data FROM docs WHERE docs MATCH ?"
+        args = [expr]
+        if kinds:
+            sql += f" AND kind IN ({','.join('?' * len(kinds))})"
+            args.extend(kinds)
+        sql += f" ORDER BY bm25(docs, 0, 0, 0, {', '.join(map(str, WEIGHTS))}) LIMIT ?"
+        args.append(limit)
+
+        self.flush()
+        with self.lock:
+            try:
+                rows = self.conn.execute(sql, args).fetchall()
+            except sqlite3.OperationalError as e:
+                print(f"Index: bad query {query!r}: {e}")
+                return []
+        return [(kind, key, Recipe.from_dict(kind, json.loads(data))) for kind, key, data in rows]
+
+    def search_keys(self, query, kinds=None, cancel=None):
+        # Blocks on flush(), so callers on the main loop go through aio.run_io
+        return {(kind, key) for kind, key, _ in self.search(query, kinds, limit=-1)}
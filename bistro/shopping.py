@@ -0,0 +1,75 @@
+from dataclasses import replace
+
+from bistro.ingredients import parse_ingredient
+from bistro.model import Ingredient
+
+
+class ShoppingList:
+    """The shopping list, one entry per ingredient.
+
+    Entries are keyed by canonical ingredient name and kept in the order
+    they were first added. Adding an ingredient that is already listed
+    merges the amounts, so "2 eggs" and then "3 eggs" leave "5 eggs".
+    Amounts that can't be added up, such as "2 cups flour" and "1 pinch
+    flour", stay side by side in the same entry.
+
+    Each amount is stored as one line of text, next to its entry's key: the
+    line as it was added, until another amount is merged into it. The key
+    is stored because a recipe's Ingredient is keyed by its name alone, which
+    the line can't always be parsed back into ("to taste Salt"). add() and
+    remove() return the line changes as (key, old, new), with None for a
+    missing side, for Storage.write_shopping_items().
+    """
+
+    def __init__(self, rows=()):
+        self.entries = {}  # key -> [(ParsedIngredient, line)], in insertion order
+        for key, line in rows:
+            self.add(line, key or None)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    @staticmethod
+    def key_for(text):
+        return parse_ingredient(text).key or text.strip().lower()
+
+    def rows(self):
+        """Every stored (key, line), in order."""
+        return [(key, line) for key, amounts in self.entries.items() for _, line in amounts]
+
+    def text(self, key):
+        return " + ".join(line for _, line in self.entries[key])
+
+    def name(self, key):
+        return self.entries[key][0][0].name
+
+    def add(self, item, key=None):
+        """Add a line of text or a recipe's Ingredient and return (key, old, new).
+
+        key files a line under a stored key instead of the one parsed from it.
+        """
+        text = str(item).strip()
+        parsed = item.parsed if isinstance(item, Ingredient) else parse_ingredient(text)
+        key = key or parsed.key or text.lower()
+        amounts = self.entries.setdefault(key, [])
+        for i, (amount, line) in enumerate(amounts):
+            # Amounts under one key are the same ingredient, even when a
+            # stored line parses to another name ("to taste Salt")
+            other = parsed if parsed.key == amount.key else replace(parsed, name=amount.name)
+            if (merged := amount.combine(other)) is not None:
+                # "salt" and "salt" again stay as they were written
+                new = line if merged is amount else str(merged)
+                amounts[i] = (merged, new)
+                return key, line, new
+        amounts.append((parsed, text))
+        return key, None, text
+
+    def remove(self, key):
+        """Drop an entry and return its (key, old, None) line changes."""
+        return [(key, line, None) for _, line in self.entries.pop(key, ())]
@@ -0,0 +1,346 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+
+from gi.repository import GLib
+
+from bistro import profiling
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS favorites (
+    pos INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    UNIQUE (kind, id)
+);
+CREATE TABLE IF NOT EXISTS recipes (
+    pos INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS shopping_list (
+    pos INTEGER PRIMARY KEY,
+    key TEXT NOT NULL DEFAULT '',
+    text TEXT NOT NULL,
+    UNIQUE (key, text)
+);
+CREATE TABLE IF NOT EXISTS pantry (
+    pos INTEGER PRIMARY KEY,
+    text TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Legacy JSON files and the favorites kind they hold
+FAVORITE_FILES = {
+    "cocktail": "cocktails.json",
+    "meal": "meals.json",
+}
+
+
+class WriteBehind:
+    """Queue of SQLite writes committed by a background thread.
+
+    Subclasses set self.conn and self.lock, which guards every use of the
+    connection, and call init_writer(). Writes arriving within WRITE_DELAY
+    of each other share one transaction, and a queued write is replaced by
+    a newer one with the same coalescing key. If the shared transaction
+    fails, each write is retried in a transaction of its own, so one bad
+    row doesn't roll back unrelated changes.
+    """
+
+    WRITE_DELAY = 0.25  # seconds
+
+    def init_writer(self):
+        self.cond = threading.Condition()
+        self.pending = {}  # coalescing key -> [(sql, args)], oldest first
+        self.writing = False
+        self.flushing = False
+        self.writer = None
+
+    def queue(self, key, sql, args):
+        """Queue a write for the writer thread.
+
+        A queued write with the same key, e.g. the same favorite starred and
+        unstarred again, is dropped in favor of this one. key None never
+        coalesces.
+        """
+        self.queue_many(key, [(sql, args)])
+
+    def queue_many(self, key, statements):
+        """Queue [(sql, args)] statements, always committed together."""
+        with self.cond:
+            if key is None:
+                key = object()
+            self.pending.pop(key, None)
+            self.pending[key] = statements
+            if self.writer is None:
+                name = f"{type(self).__name__.lower()}-writer"
+                self.writer = threading.Thread(target=self.run_writer, name=name, daemon=True)
+                self.writer.start()
+            self.cond.notify_all()
+
+    def run_writer(self):
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.pending)
+                # Let a burst of changes collect, unless someone is waiting on flush()
+                self.cond.wait_for(lambda: self.flushing, timeout=self.WRITE_DELAY)
+                batch = list(self.pending.values())
+                self.pending.clear()
+                self.writing = True
+            try:
+                with profiling.span(f"{type(self).__name__}.write", changes=len(batch)), self.lock:
+                    self.commit(batch)
+            finally:
+                with self.cond:
+                    self.writing = False
+                    self.cond.notify_all()
+
+    def commit(self, batch):
+        # Caller holds self.lock
+        try:
+            with self.conn:
+                for statements in batch:
+                    for sql, args in statements:
+                        self.conn.execute(sql, args)
+            return
+        except sqlite3.Error as e:
+            if len(batch) > 1:
+                print(f"{type(self).__name__}: {len(batch)} changes failed together ({e}), retrying one by one")
+            else:
+                print(f"{type(self).__name__}: failed to write {batch[0][0][0]!r} {batch[0][0][1]!r}: {e}")
+                return
+
+        for statements in batch:
+            try:
+                with self.conn:
+                    for sql, args in statements:
+                        self.conn.execute(sql, args)
+            except sqlite3.Error as e:
+                print(f"{type(self).__name__}: failed to write {statements[0][0]!r} {statements[0][1]!r}: {e}")
+
+    def flush(self):
+        """Block until every queued write is committed."""
+        with self.cond:
+            self.flushing = True
+            self.cond.notify_all()
+            self.cond.wait_for(lambda: not self.pending and not self.writing)
+            self.flushing = False
+
+
+class Storage(WriteBehind):
+    """Transactional store for favorites, custom recipes, the shopping list,
+    the pantry and settings.
+
+    A single SQLite database in WAL mode replaces the JSON files the pages
+    used to rewrite in full on every change; each change is now a row-level
+    insert, update or delete. The JSON files are imported once, the first
+    time the database is opened, and left in place.
+
+    Changes are queued and committed by a writer thread (see WriteBehind),
+    so the main loop never waits on the disk. Repeated changes to the same
+    row collapse into the last one. Reads and flush() wait for the queue to
+    drain; the application flushes on shutdown.
+    """
+
+    DATA_DIR = os.path.join(GLib.get_user_data_dir(), "bistro")
+    DB_NAME = "bistro.db"
+
+    _default = None
+
+    @classmethod
+    def get_default(cls):
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    def __init__(self, data_dir=None):
+        self.data_dir = data_dir or self.DATA_DIR
+        if not os.path.exists(self.data_dir):
+            os.makedirs(self.data_dir)
+        self.path = os.path.join(self.data_dir, self.DB_NAME)
+        self.lock = threading.RLock()
+        self.init_writer()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.migrate()
+        self.import_legacy()
+
+    def migrate(self):
+        """Bring tables created by older versions up to SCHEMA."""
+        with self.lock:
+            columns = [row[1] for row in self.conn.execute("PRAGMA table_info(shopping_list)")]
+            if "key" not in columns:
+                # Rows get their key the next time the list is loaded
+                self.conn.executescript("""
+                    BEGIN;
+                    ALTER TABLE shopping_list RENAME TO shopping_list_old;
+                    CREATE TABLE shopping_list (
+                        pos INTEGER PRIMARY KEY,
+                        key TEXT NOT NULL DEFAULT '',
+                        text TEXT NOT NULL,
+                        UNIQUE (key, text)
+                    );
+                    INSERT INTO shopping_list (pos, text) SELECT pos, text FROM shopping_list_old;
+                    DROP TABLE shopping_list_old;
+                    COMMIT;
+                """)
+
+    # Legacy import
+
+    def read_legacy(self, name, default):
+        path = os.path.join(self.data_dir, name)
+        if not os.path.exists(path):
+            # Bundled defaults next to the application, as the pages used to load
+            path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", name)
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"Storage: could not import {name}: {e}")
+        return default
+
+    def import_legacy(self):
+        with self.lock:
+            if self.conn.execute("SELECT 1 FROM meta WHERE key = 'imported'").fetchone():
+                return
+
+            with self.conn:
+                for kind, name in FAVORITE_FILES.items():
+                    for item_id, data in self.read_legacy(name, {}).items():
+                        self.conn.execute(
+                            "INSERT OR IGNORE INTO favorites (kind, id, data) VALUES (?, ?, ?)",
+                            (kind, str(item_id), json.dumps(data)),
+                        )
+
+                # my_recipes.json has no bundled default
+                path = os.path.join(self.data_dir, "my_recipes.json")
+                recipes = []
+                if os.path.exists(path):
+                    try:
+                        with open(path, 'r') as f:
+                            recipes = json.load(f)
+                    except Exception as e:
+                        print(f"Storage: could not import my_recipes.json: {e}")
+                for r in recipes:
+                    r.setdefault('id', uuid.uuid4().hex)
+                    self.conn.execute("INSERT OR IGNORE INTO recipes (id, data) VALUES (?, ?)", (r['id'], json.dumps(r)))
+
+                for item in self.read_legacy("shopping_list.json", []):
+                    self.conn.execute("INSERT OR IGNORE INTO shopping_list (text) VALUES (?)", (item,))
+
+                for key, value in self.read_legacy("settings.json", {}).items():
+                    self.conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+                self.conn.execute("INSERT INTO meta (key, value) VALUES ('imported', '1')")
+
+    # Favorites
+
+    def get_favorites(self, kind):
+        """Return {id: data} for kind ("cocktail" or "meal"), oldest first."""
+        self.flush()
+        with self.lock:
+            rows = self.conn.execute("SELECT id, data FROM favorites WHERE kind = ? ORDER BY pos", (kind,)).fetchall()
+        return {item_id: json.loads(data) for item_id, data in rows}
+
+    def put_favorite(self, kind, item_id, data):
+        self.queue(
+            ("favorite", kind, str(item_id)),
+            "INSERT INTO favorites (kind, id, data) VALUES (?, ?, ?) "
+            "ON CONFLICT (kind, id) DO UPDATE SET data = excluded.data",
+            (kind, str(item_id), json.dumps(data)),
+        )
+
+    def delete_favorite(self, kind, item_id):
+        self.queue(("favorite", kind, str(item_id)), "DELETE FROM favorites WHERE kind = ? AND id = ?", (kind, str(item_id)))
+
+    # Custom recipes
+
+    def get_recipes(self):
+        self.flush()
+        with self.lock:
+            rows = self.conn.execute("SELECT data FROM recipes ORDER BY pos").fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def put_recipe(self, data):
+        """Insert or update a custom recipe, giving it an id if it has none."""
+        if not data.get('id'):
+            data['id'] = uuid.uuid4().hex
+        self.queue(
+            ("recipe", data['id']),
+            "INSERT INTO recipes (id, data) VALUES (?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET data = excluded.data",
+            (data['id'], json.dumps(data)),
+        )
+        return data['id']
+
+    def delete_recipe(self, recipe_id):
+        self.queue(("recipe", recipe_id), "DELETE FROM recipes WHERE id = ?", (recipe_id,))
+
+    # Shopping list
+
+    def get_shopping_list(self):
+        """Return [(key, text)], oldest first. key is '' for rows stored
+        before keys were."""
+        self.flush()
+        with self.lock:
+            return self.conn.execute("SELECT key, text FROM shopping_list ORDER BY pos").fetchall()
+
+    def write_shopping_items(self, changes):
+        """Apply [(key, old, new)] line changes, in order.
+
+        A change with no old line appends new, one with no new line deletes
+        old and any other rewrites old in place, keeping its position.
+        """
+        for key, old, new in changes:
+            if old is None:
+                self.queue(None, "INSERT OR IGNORE INTO shopping_list (key, text) VALUES (?, ?)", (key, new))
+            elif new is None:
+                self.queue(None, "DELETE FROM shopping_list WHERE key = ? AND text = ?", (key, old))
+            elif old != new:
+                self.queue(None, "UPDATE shopping_list SET text = ? WHERE key = ? AND text = ?", (new, key, old))
+
+    def replace_shopping_list(self, rows):
+        """Replace every (key, text) row at once, in one transaction."""
+        self.flush()
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM shopping_list")
+            self.conn.executemany("INSERT OR IGNORE INTO shopping_list (key, text) VALUES (?, ?)", rows)
+
+    # Pantry: ingredients on hand, kept like the shopping list
+
+    def get_pantry(self):
+        self.flush()
+        with self.lock:
+            return [text for (text,) in self.conn.execute("SELECT text FROM pantry ORDER BY pos")]
+
+    def add_pantry_item(self, text):
+        self.queue(("pantry", text), "INSERT OR IGNORE INTO pantry (text) VALUES (?)", (text,))
+
+    def remove_pantry_item(self, text):
+        self.queue(("pantry", text), "DELETE FROM pantry WHERE text = ?", (text,))
+
+    # Settings
+
+    def get_setting(self, key, default=None):
+        self.flush()
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_setting(self, key, value):
+        self.queue(("setting", key), "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, json.dumps(value)))
@@ -0,0 +1,207 @@
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+
+import gi
+
+gi.require_version('GdkPixbuf', '2.0')
+from gi.repository import GLib, GdkPixbuf
+
+from bistro import profiling
+
+
+class ThumbnailStore:
+    """Persistent store of pre-scaled thumbnails in the user cache directory.
+
+    Images are scaled down to the size the recipe rows render (SIZE x SIZE,
+    cropped to fill) and written as PNG files named by the SHA-256 of their
+    content, so identical images share a file. index.json maps source URLs
+    to digests and is written at most every INDEX_DELAY seconds, and at
+    exit. Once the store grows past MAX_BYTES the least recently accessed
+    files are removed, down to LOW_WATER of it.
+    """
+
+    STORE_DIR = os.path.join(GLib.get_user_cache_dir(), "bistro", "thumbnails")
+    SIZE = 150
+    MAX_BYTES = 64 * 1024 * 1024
+    LOW_WATER = 0.75
+    INDEX_DELAY = 2.0  # seconds
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    @classmethod
+    def get_default(cls):
+        # First called from several I/O pool threads at once
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    def __init__(self, store_dir=None, size=None, max_bytes=None):
+        self.store_dir = store_dir or self.STORE_DIR
+        self.size = size or self.SIZE
+        self.max_bytes = max_bytes or self.MAX_BYTES
+        self.index_file = os.path.join(self.store_dir, "index.json")
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()  # One writer of index.json.tmp at a time
+        self.index = None  # url -> digest
+        self.files = {}  # digest -> [access time, size]
+        self.total_bytes = 0
+        self.dirty = False
+        self.save_timer = None
+        atexit.register(self.flush)
+
+    def ensure_index(self):
+        if self.index is not None:
+            return
+        if not os.path.exists(self.store_dir):
+            os.makedirs(self.store_dir)
+        self.index = {}
+        self.files = {digest: [atime, size] for atime, digest, size in self.scan()}
+        self.total_bytes = sum(size for _, size in self.files.values())
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, 'r') as f:
+                    self.index = json.load(f)
+            except Exception as e:
+                print(f"Thumbnails: ignoring unreadable index: {e}")
+
+    def schedule_save(self):
+        # Caller holds self.lock
+        self.dirty = True
+        if self.save_timer is None:
+            self.save_timer = threading.Timer(self.INDEX_DELAY, self.flush)
+            self.save_timer.daemon = True
+            self.save_timer.start()
+
+    def flush(self):
+        """Write index.json now if it changed since it was last written."""
+        with self.lock:
+            if self.save_timer is not None:
+                self.save_timer.cancel()
+                self.save_timer = None
+            if not self.dirty:
+                return
+            self.dirty = False
+            index = dict(self.index)
+        self.save_index(index)
+
+    @profiling.traced()
+    def save_index(self, index):
+        tmp = self.index_file + ".tmp"
+        try:
+            with self.save_lock:
+                with open(tmp, 'w') as f:
+                    json.dump(index, f, separators=(",", ":"))
+                os.replace(tmp, self.index_file)
+        except Exception as e:
+            print(f"Thumbnails: failed to save index: {e}")
+
+    def path_for(self, digest):
+        return os.path.join(self.store_dir, digest[:2], f"{digest}.png")
+
+    def lookup(self, url):
+        """Return the path of the stored thumbnail for url, or None."""
+        with self.lock:
+            self.ensure_index()
+            digest = self.index.get(url)
+        if not digest:
+            return None
+        path = self.path_for(digest)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        with self.lock:
+            if entry := self.files.get(digest):
+                entry[0] = time.time()
+        return path
+
+    def read(self, url):
+        """Return the stored PNG bytes for url, or None."""
+        path = self.lookup(url)
+        if not path:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def on_size_prepared(self, loader, w, h):
+        # Have the loader decode straight to the size the crop needs; the
+        # JPEG loader then skips most of the work for full size photos
+        factor = self.size / min(w, h)
+        if factor < 1:
+            loader.set_size(max(self.size, round(w * factor)), max(self.size, round(h * factor)))
+
+    def scale(self, data):
+        loader = GdkPixbuf.PixbufLoader()
+        loader.connect("size-prepared", self.on_size_prepared)
+        loader.write(data)
+        loader.close()
+        pixbuf = loader.get_pixbuf()
+
+        w, h = pixbuf.get_width(), pixbuf.get_height()
+        if min(w, h) >= self.size and (w, h) != (self.size, self.size):
+            x, y = (w - self.size) // 2, (h - self.size) // 2
+            pixbuf = pixbuf.new_subpixbuf(x, y, self.size, self.size).copy()
+
+        ok, buf = pixbuf.save_to_bufferv("png", [], [])
+        if not ok:
+            raise ValueError("PNG encoding failed")
+        return buf
+
+    @profiling.traced()
+    def store(self, url, data):
+        """Scale the downloaded image data, persist it and return the PNG bytes."""
+        scaled = self.scale(data)
+        digest = hashlib.sha256(scaled).hexdigest()
+        path = self.path_for(digest)
+
+        with self.lock:
+            self.ensure_index()
+            if digest not in self.files or not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = path + ".tmp"
+                with open(tmp, 'wb') as f:
+                    f.write(scaled)
+                os.replace(tmp, path)
+                if digest not in self.files:
+                    self.total_bytes += len(scaled)
+            self.files[digest] = [time.time(), len(scaled)]
+            self.index[url] = digest
+            if self.total_bytes > self.max_bytes:
+                self.evict()
+            self.schedule_save()
+        return scaled
+
+    def scan(self):
+        for root, _, names in os.walk(self.store_dir):
+            for name in names:
+                if name.endswith(".png"):
+                    st = os.stat(os.path.join(root, name))
+                    yield st.st_mtime, name[:-4], st.st_size
+
+    def evict(self):
+        # Caller holds self.lock. Oldest access time goes first, and enough
+        # goes that the next few stores don't have to evict again.
+        target = self.max_bytes * self.LOW_WATER
+        removed = set()
+        for atime, digest in sorted((atime, digest) for digest, (atime, _) in self.files.items()):
+            if self.total_bytes <= target:
+                break
+            try:
+                os.remove(self.path_for(digest))
+            except FileNotFoundError:
+                pass
+            except OSError:
+                continue
+            removed.add(digest)
+            self.total_bytes -= self.files.pop(digest)[1]
+
+        self.index = {u: d for u, d in self.index.items() if d not in removed}
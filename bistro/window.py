@@ -1,40 +1,25 @@
-import os
+import importlib
 import gi
 gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
-from gi.repository import Gtk, Adw, Gio, Gdk
+from gi.repository import Gtk, Adw, Gio
 
-from bistro.pages.cocktails import CocktailPage
-from bistro.pages.recipe_search import RecipeSearchPage
-from bistro.pages.collection import CollectionPage
-from bistro.pages.shopping_list import ShoppingListPage
-from bistro.pages.add_recipe import AddRecipePage
+from bistro import profiling
+
+# Tabs in order: name, title, icon, and the page class as "module:Class".
+# Page modules are imported when their tab is first shown.
+PAGES = (
+    ("cocktails", "Cocktails", "drinks-symbolic", "bistro.pages.cocktails:CocktailPage"),
+    ("recipes", "Recipes", "fast-food-symbolic", "bistro.pages.recipe_search:RecipeSearchPage"),
+    ("collection", "Collection", "starred-symbolic", "bistro.pages.collection:CollectionPage"),
+    ("shopping_list", "Shopping List", "feather-tag-symbolic", "bistro.pages.shopping_list:ShoppingListPage"),
+)
 
 class UnifiedWindow(Adw.ApplicationWindow):
+    @profiling.traced("UnifiedWindow.__init__")
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
-        # Load resources locally to ensure icons are available
-        base_path = os.path.dirname(os.path.abspath(__file__))
-        resource_path = os.path.join(base_path, "..", "bistro.gresource")
-        
-        if os.path.exists(resource_path):
-            try:
-                resource = Gio.Resource.load(resource_path)
-                # Registering multiple times is safe (handled by GLib) or might throw if already registered
-                # We catch exception just in case
-                try:
-                    resource._register()
-                except:
-                    pass
-            except Exception as e:
-                print(f"Window: Failed to load resource: {e}")
-
-        # Ensure icon theme path
-        icon_theme = Gtk.IconTheme.get_for_display(Gdk.Display.get_default())
-        if not "/com/github/cadmiumcmyk/Bistro/icons" in icon_theme.get_resource_path():
-             icon_theme.add_resource_path("/com/github/cadmiumcmyk/Bistro/icons")
-        
         self.set_title("Bistro")
         self.set_default_size(500, 900)
         
@@ -81,37 +66,26 @@ class UnifiedWindow(Adw.ApplicationWindow):
         theme_section.append("Dark", "app.theme('dark')")
         menu_model.append_section("Theme", theme_section)
 
+        menu_model.append("Offline Catalog", "app.offline-catalog")
         menu_model.append("About", "app.about")
         menu_model.append("Quit", "app.quit")
         menu_btn.set_menu_model(menu_model)
         
         header.pack_end(menu_btn)
         
-        # Shopping List
-        self.shopping_list_page = ShoppingListPage()
+        # Favorites, custom recipes and the shopping list, shared by all pages
+        self.repository = self.get_application().repository
+
+        # Pages are built the first time their tab is shown; until then
+        # each tab holds an empty Adw.Bin
+        self.pages = {}  # name -> page, once built
+        for name, title, icon, path in PAGES:
+            tab = self.stack.add_titled(Adw.Bin(), name, title)
+            tab.set_icon_name(icon)
+        self.stack.connect("notify::visible-child-name", self.on_page_shown)
+        self.on_page_shown(self.stack)
 
-        # Pages
-        # Cocktails
-        page1 = self.stack.add_titled(CocktailPage(self.shopping_list_page), "cocktails", "Cocktails")
-        page1.set_icon_name("drinks-symbolic")
-        
-        # Recipes (replacing Breweries)
-        page2 = self.stack.add_titled(RecipeSearchPage(self.shopping_list_page), "recipes", "Recipes")
-        page2.set_icon_name("fast-food-symbolic")
-        
-        # Collection (replacing My Recipes)
-        self.collection_page = CollectionPage(self.shopping_list_page)
-        page3 = self.stack.add_titled(self.collection_page, "collection", "Collection")
-        page3.set_icon_name("starred-symbolic")
-        
-        # Shopping List
-        page4 = self.stack.add_titled(self.shopping_list_page, "shopping_list", "Shopping List")
-        page4.set_icon_name("feather-tag-symbolic")
-        
         content_box.append(self.stack)
-        
-        # Connect to stack switching to refresh collection
-        self.stack.connect("notify::visible-child", self.on_stack_switch)
 
         # Adaptive UI: Bottom Switcher for narrow screens
         self.bottom_switcher = Adw.ViewSwitcherBar()
@@ -124,12 +98,20 @@ class UnifiedWindow(Adw.ApplicationWindow):
         breakpoint.add_setter(self.bottom_switcher, "reveal", True)
         self.add_breakpoint(breakpoint)
 
-    def on_stack_switch(self, stack, param):
-        if stack.get_visible_child() == self.collection_page:
-            self.collection_page.refresh_all()
+    @profiling.traced("UnifiedWindow.build_page")
+    def on_page_shown(self, stack, *args):
+        name = stack.get_visible_child_name()
+        if not name or name in self.pages:
+            return
+        path = next(p for n, _, _, p in PAGES if n == name)
+        module, cls = path.split(":")
+        page = getattr(importlib.import_module(module), cls)(self.repository)
+        self.pages[name] = page
+        stack.get_child_by_name(name).set_child(page)
 
     def on_add_clicked(self, btn):
-        page = AddRecipePage(on_save_callback=self.collection_page.refresh_all)
+        from bistro.pages.add_recipe import AddRecipePage
+        page = AddRecipePage(self.repository)
         self.push_page(page)
 
     def push_page(self, page):
@@ -1,10 +1,20 @@
 import sys
 import os
 from gi.repository import Gio
-from bistro.app import UnifiedApp
+from bistro import profiling
 
 if __name__ == "__main__":
 
+    # --trace[=FILE] records a Chrome trace of the session (see bistro/profiling.py).
+    # It has to be enabled before the application modules are imported.
+    argv = []
+    for arg in sys.argv:
+        if arg == "--trace" or arg.startswith("--trace="):
+            profiling.enable(arg.partition("=")[2] or "bistro-trace.json")
+        else:
+            argv.append(arg)
+
+    from bistro.app import UnifiedApp
+
     app = UnifiedApp()
-    sys.exit(app.run(sys.argv))
-    
+    sys.exit(app.run(argv))